@@ -8,47 +8,15 @@ from dotenv import load_dotenv
 from werkzeug.utils import secure_filename
 from datetime import datetime
 import os
-import random, smtplib
-from email.mime.text import MIMEText
+import random
+import threading
 from datetime import datetime, timedelta
-import smtplib
-from email.message import EmailMessage
-from config import EMAIL_ADDRESS, EMAIL_PASSWORD, ADMIN_EMAIL
-from models import db, User, Medicine, Order, Offer
-
-
-def send_order_email(user_email, order_details):
-    msg = EmailMessage()
-    msg['Subject'] = '📦 New Order Placed'
-    msg['From'] = EMAIL_ADDRESS
-    msg['To'] = ADMIN_EMAIL
-    msg.set_content(f'''
-Hello Admin,
-
-A new order has been placed!
-
-👤 Customer: {user_email}
-🛍️ Order Summary:
-{order_details}
-
-Please check the admin dashboard for full details.
-
-Thanks,
-Your Website Bot 🤖
-''')
-
-    # Send email via Gmail SMTP
-    with smtplib.SMTP_SSL('smtp.gmail.com', 465) as smtp:
-        smtp.login(EMAIL_ADDRESS, EMAIL_PASSWORD)
-        smtp.send_message(msg)
+from models import db, User, Medicine, OrderHeader, Offer
+from utils import send_email, send_order_email
 
 app = Flask(__name__)
 app.config.from_object(Config)
 
-# Email config
-EMAIL_USER = app.config.get('EMAIL_USER', 'akshadavalkunde40@gmail.com')
-EMAIL_PASS = app.config.get('EMAIL_PASS', 'qggb usmr hgjr fgze')
-
 db.init_app(app)
 migrate = Migrate(app, db)
 bcrypt = Bcrypt(app)
@@ -66,6 +34,29 @@ app.register_blueprint(auth_bp)
 app.register_blueprint(admin_bp, url_prefix='/admin')
 app.register_blueprint(doctor_bp)
 
+# Background delivery of queued emails, the admin order digest, PDF reports and
+# the release of expired checkout holds.
+# Started by the first request a process serves, not on import, so scripts,
+# `flask db` commands and the reloader's watcher process never run them.
+from services.outbox import start_workers
+from services.digest import start_digest_worker
+from services.reports import start_report_workers
+from services.stock import start_reservation_sweeper
+_workers_lock = threading.Lock()
+_workers_started = threading.Event()
+
+@app.before_request
+def start_background_workers():
+    if _workers_started.is_set() or not app.config.get('BACKGROUND_WORKERS'):
+        return
+    with _workers_lock:
+        if not _workers_started.is_set():
+            start_workers(app)
+            start_digest_worker(app)
+            start_report_workers(app)
+            start_reservation_sweeper(app)
+            _workers_started.set()
+
 # ------------------ Login Manager ------------------
 @login_manager.user_loader
 def load_user(user_id):
@@ -73,19 +64,6 @@ def load_user(user_id):
 
 
 
-def send_email(to_email, subject, body):
-    try:
-        msg = MIMEText(body)
-        msg['Subject'] = subject
-        msg['From'] = EMAIL_USER
-        msg['To'] = to_email
-        with smtplib.SMTP('smtp.gmail.com', 587) as server:
-            server.starttls()
-            server.login(EMAIL_USER, EMAIL_PASS)
-            server.sendmail(EMAIL_USER, [to_email], msg.as_string())
-    except Exception as e:
-        print('Email Error:', e)
-
 # ------------------ Routes ------------------
 @app.route('/')
 def home():
@@ -101,13 +79,14 @@ def home():
 @login_required
 def place_order():
     # 1. Save order to DB
-    order = Order(user_id=current_user.id, status='Pending')
+    order = OrderHeader(user_id=current_user.id, status='Pending')
     db.session.add(order)
-    db.session.commit()
+    db.session.flush()
 
-    # 2. Send email to admin
+    # 2. Queue email to admin, committed together with the order
     order_details = f'Order ID: {order.id}, Items: {len(cart_items)}'
     send_order_email(current_user.email, order_details)
+    db.session.commit()
 
     flash('Your order has been placed!', 'success')
     return redirect(url_for('my_orders'))
@@ -136,23 +115,9 @@ def register():
         otp_expiry = datetime.utcnow() + timedelta(minutes=10)
         user = User(email=email, phone=phone, password=password, otp=otp, otp_expiry=otp_expiry, is_verified=False)
         db.session.add(user)
+        # Send OTP to email (queued, goes out with the commit)
+        send_email(email, 'Pharma Registration OTP', f'Your OTP for registration is: {otp}')
         db.session.commit()
-        # Send OTP to email
-        try:
-            msg = MIMEText(f'Your OTP for registration is: {otp}')
-            msg['Subject'] = 'Pharma Registration OTP'
-            msg['From'] = EMAIL_USER
-            msg['To'] = email
-            with smtplib.SMTP('smtp.gmail.com', 587) as server:
-                server.starttls()
-                server.login(EMAIL_USER, EMAIL_PASS)
-                server.sendmail(EMAIL_USER, [email], msg.as_string())
-        except Exception as e:
-            print('OTP Email Error:', e)
-            flash('Failed to send OTP email. Please try again.')
-            db.session.delete(user)
-            db.session.commit()
-            return redirect(url_for('register'))
         session['pending_user_id'] = user.id
         flash('OTP sent to your email. Please verify.')
         return redirect(url_for('verify_otp'))
@@ -240,7 +205,7 @@ def clear_cart():
 @app.route('/myorders')
 @login_required
 def my_orders():
-    orders = Order.query.filter_by(user_id=current_user.id).order_by(Order.id.desc()).all()
+    orders = OrderHeader.query.filter_by(user_id=current_user.id).order_by(OrderHeader.id.desc()).all()
     return render_template('my_orders.html', orders=orders)
 
 @app.route('/order', methods=['GET'])
@@ -262,21 +227,9 @@ def forgot_password():
         otp_expiry = datetime.utcnow() + timedelta(minutes=10)
         user.otp = otp
         user.otp_expiry = otp_expiry
+        # Send OTP to email (queued, goes out with the commit)
+        send_email(email, 'Pharma Password Reset OTP', f'Your OTP for password reset is: {otp}')
         db.session.commit()
-        # Send OTP to email
-        try:
-            msg = MIMEText(f'Your OTP for password reset is: {otp}')
-            msg['Subject'] = 'Pharma Password Reset OTP'
-            msg['From'] = EMAIL_USER
-            msg['To'] = email
-            with smtplib.SMTP('smtp.gmail.com', 587) as server:
-                server.starttls()
-                server.login(EMAIL_USER, EMAIL_PASS)
-                server.sendmail(EMAIL_USER, [email], msg.as_string())
-        except Exception as e:
-            print('OTP Email Error:', e)
-            flash('Failed to send OTP email. Please try again.')
-            return redirect(url_for('forgot_password'))
         session['reset_user_id'] = user.id
         flash('OTP sent to your email. Please verify.')
         return redirect(url_for('reset_password_otp'))
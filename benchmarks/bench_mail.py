@@ -0,0 +1,111 @@
+"""Per-message cost of sending mail: a new connection each time vs the pool.
+
+Starts a local stand-in SMTP server (aiosmtpd when it is installed,
+otherwise a tiny built-in responder that can add a delay before every
+reply to mimic a remote server) and sends the same messages three ways:
+
+  per-message  connect, EHLO, send, QUIT for every message (the old utils code)
+  pooled       services.mail.SMTPPool, one send_many() call per message
+  batched      services.mail.SMTPPool.send_many() over the whole batch
+
+plus the file sink backend. Against Gmail the per-message path also pays
+for TLS and AUTH on every message, so the gap there is wider than here.
+
+    python benchmarks/bench_mail.py [messages] [reply_delay_ms]
+"""
+import os
+import smtplib
+import socket
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.mail import SMTPPool, FileSink, build_message
+
+MESSAGES = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+REPLY_DELAY = (float(sys.argv[2]) if len(sys.argv) > 2 else 2.0) / 1000
+
+
+class StandInSMTP(socketserver.StreamRequestHandler):
+    """Just enough SMTP for smtplib: accepts everything, stores nothing"""
+
+    def reply(self, text):
+        time.sleep(REPLY_DELAY)
+        self.wfile.write(text.encode() + b'\r\n')
+
+    def handle(self):
+        self.reply('220 localhost stand-in ESMTP')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line[:4].upper()
+            if command == b'EHLO':
+                self.reply('250-localhost\r\n250-8BITMIME\r\n250 SMTPUTF8')
+            elif command == b'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                while self.rfile.readline() not in (b'.\r\n', b''):
+                    pass
+                self.reply('250 OK: queued')
+            elif command == b'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('250 OK')
+
+
+def start_server():
+    try:
+        from aiosmtpd.controller import Controller
+        from aiosmtpd.handlers import Sink
+    except ImportError:
+        server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), StandInSMTP)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return 'built-in stand-in', server.server_address[1]
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+    Controller(Sink(), hostname='127.0.0.1', port=port).start()
+    return 'aiosmtpd', port
+
+
+def per_message(port, messages):
+    for msg in messages:
+        with smtplib.SMTP('127.0.0.1', port) as smtp:
+            smtp.send_message(msg)
+
+
+def pooled(port, messages):
+    pool = SMTPPool('127.0.0.1', port, use_ssl=False, size=1)
+    for msg in messages:
+        assert pool.send_many([msg]) == [None]
+    pool.close()
+
+
+def batched(port, messages):
+    pool = SMTPPool('127.0.0.1', port, use_ssl=False, size=1)
+    assert pool.send_many(messages) == [None] * len(messages)
+    pool.close()
+
+
+def file_sink(port, messages):
+    sink = FileSink(tempfile.mkdtemp())
+    assert sink.send_many(messages) == [None] * len(messages)
+
+
+if __name__ == '__main__':
+    server, port = start_server()
+    messages = [build_message(f'user{n}@example.com', f'Bench {n}', 'Hello from the benchmark.\n')
+                for n in range(MESSAGES)]
+    delay = f', {REPLY_DELAY * 1000:g} ms per reply' if server != 'aiosmtpd' else ''
+    print(f'{MESSAGES} messages to {server} on port {port}{delay}')
+    for run in (per_message, pooled, batched, file_sink):
+        started = time.perf_counter()
+        run(port, messages)
+        elapsed = time.perf_counter() - started
+        print(f'{run.__name__:>12}: {elapsed:.2f}s, {elapsed / MESSAGES * 1000:.2f} ms/message')
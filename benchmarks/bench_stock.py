@@ -0,0 +1,97 @@
+"""Concurrent checkout benchmark for stock decrements.
+
+Many worker threads try to buy one unit of the same medicine until it sells
+out, first with the old read-compare-write code and then with the
+conditional UPDATE from services.stock. Prints throughput and oversells.
+
+    python benchmarks/bench_stock.py [workers] [stock]
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from config import Config
+from models import db, Medicine, User, OrderHeader, OrderLine
+from services.stock import try_decrement
+
+WORKERS = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+STOCK = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+
+db_file = os.path.join(tempfile.mkdtemp(), 'bench.db')
+app = Flask(__name__)
+app.config.from_object(Config)
+app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + db_file
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'connect_args': {'timeout': 30}}
+db.init_app(app)
+
+
+def naive_buy(med_id):
+    # What checkout used to do: read, compare in Python, write back
+    med = db.session.get(Medicine, med_id)
+    if med.stock >= 1:
+        time.sleep(0)  # let other threads interleave, as a busy server would
+        med.stock -= 1
+        return True
+    return False
+
+
+def atomic_buy(med_id):
+    return try_decrement(med_id, 1)
+
+
+def run(buy):
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        user = User(email='bench@pharma.com', phone='0', password='x')
+        med = Medicine(medicine_name='Bench', name='Bench', type='Tablet', age_group='All',
+                       category='Bench', price=10, stock=STOCK)
+        db.session.add_all([user, med])
+        db.session.commit()
+        user_id, med_id = user.id, med.id
+
+    sold = []
+    lock = threading.Lock()
+
+    def worker():
+        with app.app_context():
+            while True:
+                try:
+                    ok = buy(med_id)
+                    if ok:
+                        db.session.add(OrderHeader(user_id=user_id, total=10, lines=[
+                            OrderLine(medicine_id=med_id, quantity=1, unit_price=10, subtotal=10)]))
+                    db.session.commit()
+                except Exception:
+                    db.session.rollback()
+                    continue
+                if not ok:
+                    return
+                with lock:
+                    sold.append(1)
+
+    threads = [threading.Thread(target=worker) for _ in range(WORKERS)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    with app.app_context():
+        orders = OrderHeader.query.count()
+        final_stock = db.session.get(Medicine, med_id).stock
+    print(f'{buy.__name__:>10}: {orders} orders for {STOCK} units in {elapsed:.2f}s '
+          f'({orders / elapsed:.0f} checkouts/s), final stock {final_stock}, '
+          f'oversold {max(0, orders - STOCK)}')
+
+
+if __name__ == '__main__':
+    print(f'{WORKERS} workers, {STOCK} units of stock')
+    run(naive_buy)
+    run(atomic_buy)
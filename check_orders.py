@@ -1,4 +1,4 @@
-from models import db, Order
+from models import db, OrderHeader
 from config import Config
 from flask import Flask
 
@@ -7,7 +7,8 @@ app.config.from_object(Config)
 db.init_app(app)
 
 with app.app_context():
-    orders = Order.query.all()
+    orders = OrderHeader.query.all()
     print(f'Total orders: {len(orders)}')
     for o in orders:
-        print(f'ID: {o.id}, User: {o.user_id}, Med: {o.medicine_id}, Status: {o.status}')
+        items = ', '.join(f'{line.medicine_id} x{line.quantity}' for line in o.lines)
+        print(f'ID: {o.id}, User: {o.user_id}, Items: {items}, Status: {o.status}')
@@ -9,6 +9,13 @@ class Config:
     SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(BASE_DIR, 'pharma.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     UPLOAD_FOLDER = os.path.join(BASE_DIR, 'static', 'uploads')
+    BACKGROUND_WORKERS = True  # start the threads below with the first request; False for none at all
+    MAIL_WORKERS = 2  # outbox delivery threads per process; 0 turns delivery off
+    # New orders reach the admin as one digest email per window, or sooner once this
+    # many are waiting. ADMIN_DIGEST_MINUTES = 0 sends one email per order instead.
+    ADMIN_DIGEST_MINUTES = 15
+    ADMIN_DIGEST_MAX_ORDERS = 50
+    REPORT_WORKERS = 1  # background PDF report threads per process; 0 turns them off
 
 load_dotenv()
 
@@ -19,3 +26,17 @@ ADMIN_EMAIL = 'admin@pharama.com'
 
 EMAIL_USER = EMAIL_ADDRESS
 EMAIL_PASS = EMAIL_PASSWORD
+
+# Outgoing mail. MAIL_BACKEND=file writes .eml files to MAIL_SINK_DIR instead of
+# sending; point MAIL_HOST/MAIL_PORT at a local SMTP server (e.g. aiosmtpd) with
+# MAIL_USE_SSL=0 to try things out without Gmail.
+MAIL_BACKEND = os.getenv('MAIL_BACKEND', 'smtp')
+MAIL_HOST = os.getenv('MAIL_HOST', 'smtp.gmail.com')
+MAIL_PORT = int(os.getenv('MAIL_PORT', '465'))
+MAIL_USE_SSL = os.getenv('MAIL_USE_SSL', '1') == '1'
+MAIL_USE_TLS = os.getenv('MAIL_USE_TLS', '0') == '1'
+MAIL_POOL_SIZE = int(os.getenv('MAIL_POOL_SIZE', '2'))
+MAIL_SINK_DIR = os.getenv('MAIL_SINK_DIR', os.path.join(BASE_DIR, 'instance', 'mail'))
+
+# Finished PDF reports, served by job id from /admin/reports/<id>/download
+REPORT_DIR = os.getenv('REPORT_DIR', os.path.join(BASE_DIR, 'instance', 'reports'))
@@ -0,0 +1,30 @@
+import os
+from werkzeug.datastructures import FileStorage
+from app import app
+from models import db, Medicine, StoredFile
+from services.catalog import invalidate_catalog
+from services.images import UPLOAD_DIR, UPLOAD_URL, save_product_image, generate_derivatives
+
+
+# Move existing product images into the content-addressed store and build their
+# thumbnails / WebP variants (images uploaded before the pipeline existed).
+with app.app_context():
+    changed = []
+    for med in Medicine.query.all():
+        if not med.image or not med.image.startswith(UPLOAD_URL):
+            continue
+        path = os.path.join(UPLOAD_DIR, med.image[len(UPLOAD_URL):])
+        if not os.path.exists(path):
+            print(f"Missing image for {med.name}: {med.image}")
+            continue
+        if StoredFile.query.filter_by(path=med.image[len(UPLOAD_URL):]).first():
+            # Already in the content-addressed store, just (re)build variants
+            generate_derivatives(path)
+            continue
+        with open(path, 'rb') as f:
+            med.image = save_product_image(FileStorage(stream=f, filename=os.path.basename(path)))
+        print(f"{med.name}: {path} -> {med.image}")
+        changed.append(med.id)
+    db.session.commit()
+    invalidate_catalog(changed)
+    print(f"Thumbnails generated, {len(changed)} image path(s) updated.")
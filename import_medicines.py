@@ -0,0 +1,31 @@
+import sys
+from app import app
+from models import db
+from services.catalog import invalidate_catalog
+from services.imports import import_medicines
+
+
+# Add or update medicines from a supplier CSV, matched by (medicine_name, name):
+#   python import_medicines.py catalog.csv [--dry-run]
+if len(sys.argv) < 2:
+    sys.exit("Usage: python import_medicines.py <file.csv> [--dry-run]")
+dry_run = '--dry-run' in sys.argv[2:]
+
+with app.app_context(), open(sys.argv[1], 'rb') as f:
+    try:
+        report = import_medicines(f, dry_run=dry_run)
+    except ValueError as e:
+        db.session.rollback()
+        sys.exit(str(e))
+    for line, message in report['errors']:
+        print(f"Line {line}: {message}")
+    if report['failed'] > len(report['errors']):
+        print(f"... and {report['failed'] - len(report['errors'])} more error(s)")
+    if dry_run:
+        db.session.rollback()
+    else:
+        db.session.commit()
+        if report['inserted'] or report['updated']:
+            invalidate_catalog(None if report['inserted'] else report['ids'])
+    print(f"{'Dry run: ' if dry_run else ''}{report['rows']} row(s) read, {report['inserted']} added, "
+          f"{report['updated']} updated, {report['failed']} with errors.")
@@ -0,0 +1,37 @@
+"""add unique (user_id, med_id) index on cart
+
+Revision ID: d92f3b7c1e05
+Revises: a41d6b0e52c8
+Create Date: 2026-10-18 11:40:09.552310
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd92f3b7c1e05'
+down_revision = 'a41d6b0e52c8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Fold any duplicate lines into the oldest row before adding the unique index
+    op.execute('''
+        UPDATE cart SET quantity = (
+            SELECT SUM(c2.quantity) FROM cart c2
+            WHERE c2.user_id = cart.user_id AND c2.med_id = cart.med_id
+        )
+        WHERE id IN (SELECT MIN(id) FROM cart GROUP BY user_id, med_id HAVING COUNT(*) > 1)
+    ''')
+    op.execute('''
+        DELETE FROM cart WHERE id NOT IN (SELECT MIN(id) FROM cart GROUP BY user_id, med_id)
+    ''')
+    with op.batch_alter_table('cart', schema=None) as batch_op:
+        batch_op.create_index('ix_cart_user_id_med_id', ['user_id', 'med_id'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('cart', schema=None) as batch_op:
+        batch_op.drop_index('ix_cart_user_id_med_id')
@@ -30,28 +30,58 @@ class Medicine(db.Model):
     image = db.Column(db.String(200), nullable=True)
     description = db.Column(db.Text, nullable=True)
 
-class Order(db.Model):
+    # Bulk imports match rows to medicines by (medicine_name, name)
+    __table_args__ = (db.Index('ix_medicine_medicine_name_name', 'medicine_name', 'name'),)
+
+class OrderHeader(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    medicine_id = db.Column(db.Integer, db.ForeignKey('medicine.id'), nullable=False)
-    quantity = db.Column(db.Integer, nullable=False)
-    status = db.Column(db.String(50), default='Pending')
-    ordered_at = db.Column(db.DateTime, default=datetime.utcnow)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    status = db.Column(db.String(50), default='Pending', index=True)
+    ordered_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     address = db.Column(db.Text, nullable=True)
     prescription = db.Column(db.String(200), nullable=True)
     total = db.Column(db.Float, nullable=True)
     delivery_otp = db.Column(db.String(6), nullable=True)
     delivery_otp_expiry = db.Column(db.DateTime, nullable=True)
+    admin_notified_at = db.Column(db.DateTime, nullable=True, index=True)  # NULL until in an admin email/digest
 
     user = db.relationship('User', backref='orders')
-    medicine = db.relationship('Medicine', backref='orders')
+    lines = db.relationship('OrderLine', backref='order', cascade='all, delete-orphan', order_by='OrderLine.id')
+
+    # The customer's order timeline walks this newest-first
+    __table_args__ = (db.Index('ix_order_header_user_id_ordered_at', 'user_id', 'ordered_at'),)
+
+class OrderLine(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    order_id = db.Column(db.Integer, db.ForeignKey('order_header.id'), nullable=False, index=True)
+    medicine_id = db.Column(db.Integer, db.ForeignKey('medicine.id'), nullable=False, index=True)
+    quantity = db.Column(db.Integer, nullable=False)
+    unit_price = db.Column(db.Float, nullable=False)
+    subtotal = db.Column(db.Float, nullable=False)
+
+    medicine = db.relationship('Medicine', backref='order_lines')
+
+# Daily sales rollups, kept current by services/rollups.py on every flush that
+# creates, re-statuses or deletes orders. Analytics read these, never the orders.
+class DailyStatusSales(db.Model):
+    day = db.Column(db.Date, primary_key=True)
+    status = db.Column(db.String(50), primary_key=True)
+    orders = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0)
+
+class DailyMedicineSales(db.Model):
+    day = db.Column(db.Date, primary_key=True)
+    status = db.Column(db.String(50), primary_key=True)
+    medicine_id = db.Column(db.Integer, primary_key=True, index=True)
+    units = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0)
 
 class Offer(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text, nullable=False)
     discount = db.Column(db.Integer, nullable=False)
-    valid_until = db.Column(db.DateTime, nullable=False)
+    valid_until = db.Column(db.DateTime, nullable=False, index=True)
 
 class Cart(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -62,6 +92,9 @@ class Cart(db.Model):
     user = db.relationship('User', backref='carts')
     medicine = db.relationship('Medicine', backref='cart_items')
 
+    # One row per (user, medicine): lookups by user and upserts hit this index
+    __table_args__ = (db.Index('ix_cart_user_id_med_id', 'user_id', 'med_id', unique=True),)
+
 class Prescription(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -85,3 +118,60 @@ class Prescription(db.Model):
     user = db.relationship('User', foreign_keys=[user_id], backref='prescriptions')
     doctor = db.relationship('User', foreign_keys=[doctor_id], backref='reviewed_prescriptions')
     admin = db.relationship('User', foreign_keys=[admin_id], backref='approved_prescriptions')
+
+    __table_args__ = (db.Index('ix_prescription_user_id_submitted_at', 'user_id', 'submitted_at'),)
+
+class StoredFile(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    digest = db.Column(db.String(64), unique=True, nullable=False)  # sha256 of the content
+    path = db.Column(db.String(200), nullable=False, index=True)  # relative to the uploads folder
+    size = db.Column(db.Integer, nullable=False)
+    ref_count = db.Column(db.Integer, default=0, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class StockReservation(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    medicine_id = db.Column(db.Integer, db.ForeignKey('medicine.id'), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+class OutboxEmail(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    to_email = db.Column(db.String(120), nullable=False)
+    subject = db.Column(db.String(200), nullable=False)
+    body = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), default='pending', nullable=False)  # pending, sending, sent, failed
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime, nullable=True)
+
+    # Workers look for due messages by (status, next_attempt_at)
+    __table_args__ = (db.Index('ix_outbox_email_status_next_attempt_at', 'status', 'next_attempt_at'),)
+
+class ReportJob(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)  # e.g. prescriptions_pdf
+    params = db.Column(db.Text, nullable=False, default='{}')  # JSON filters the report was asked for
+    status = db.Column(db.String(20), default='pending', nullable=False)  # pending, running, done, failed
+    requested_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    file_path = db.Column(db.String(200), nullable=True)  # relative to REPORT_DIR once done
+    rows = db.Column(db.Integer, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+
+    # Workers claim by status; identical recent requests are found by (kind, params)
+    __table_args__ = (db.Index('ix_report_job_status_created_at', 'status', 'created_at'),
+                      db.Index('ix_report_job_kind_params', 'kind', 'params'))
+
+class CatalogState(db.Model):
+    # One row per cached area ('catalog', 'offers'); bumped in the same
+    # transaction as every write to it, so all worker processes agree on it
+    name = db.Column(db.String(20), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    changed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
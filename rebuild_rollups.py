@@ -0,0 +1,13 @@
+from app import app
+from models import db
+from services.rollups import rebuild_rollups
+from services.stats import invalidate_stats
+
+
+# Recompute the daily sales rollups from the orders, e.g. after orders were
+# edited with raw SQL that bypassed the session hooks.
+with app.app_context():
+    rebuild_rollups()
+    db.session.commit()
+    invalidate_stats()
+    print("Daily sales rollups rebuilt.")
@@ -1,18 +1,23 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session, make_response
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, abort, send_file
 from flask_login import login_required, current_user
-from models import db, Medicine, Order, Offer, User, Prescription
+from models import db, Medicine, OrderHeader, Offer, User, Prescription, ReportJob
 from utils import send_email, generate_otp, send_delivery_otp_email, send_prescription_delivery_otp_email
-from werkzeug.utils import secure_filename
 import os
-from config import Config
 from datetime import datetime, timedelta
-from io import BytesIO
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle
-from reportlab.lib import colors
-from sqlalchemy.orm import joinedload
+from services.catalog import invalidate_catalog
+from services.offers import invalidate_offers
+from services.images import save_product_image, release_product_image
+from services.orders import medicine_has_orders, line_items
+from services.stats import dashboard_stats, invalidate_stats
+from services.admin_tables import TABLES, table_page, order_status_counts
+from services.rollups import GROUPS, sales_report
+from services.exports import (csv_response, medicine_rows, order_rows, prescription_rows,
+                              MEDICINE_HEADER, ORDER_HEADER, PRESCRIPTION_HEADER)
+from services.reports import request_report, report_params, report_path
+from services.imports import import_medicines as import_medicine_rows
 
 admin_bp = Blueprint('admin', __name__)
+admin_bp.add_app_template_global(line_items)
 
 @admin_bp.route('/', methods=['GET', 'POST'])
 @login_required
@@ -29,6 +34,7 @@ def admin_dashboard():
             offer = Offer(title=title, description=desc, discount=discount, valid_until=valid_until)
             db.session.add(offer)
             db.session.commit()
+            invalidate_offers()
             flash("✅ Offer added!")
         elif 'add_prescription' in request.form:
             user_id = int(request.form['patient'])
@@ -71,10 +77,7 @@ def admin_dashboard():
 
             image_file = request.files['image']
             if image_file and image_file.filename:
-                filename = secure_filename(image_file.filename)
-                image_path = os.path.join('static/uploads', filename)
-                image_file.save(image_path)
-                image_url = '/static/uploads/' + filename
+                image_url = save_product_image(image_file)
             else:
                 image_url = ''
 
@@ -92,78 +95,49 @@ def admin_dashboard():
             )
             db.session.add(new_med)
             db.session.commit()
+            invalidate_catalog([new_med.id])
             flash('✅ Medicine added!')
 
-    meds = Medicine.query.all()
-    # Add discounted_price to each medicine dict
-    medicines_with_discount = []
-    for med in meds:
-        discounted_price = med.price * (1 - med.discount / 100)
-        medicines_with_discount.append({
-            'medicine': med,
-            'discounted_price': discounted_price
-        })
-
-    total_meds = Medicine.query.count()
-    total_orders = Order.query.count()
-    total_users = User.query.filter_by(is_admin=False).count()
-    total_prescriptions = Prescription.query.count()
-    # Get all distinct order statuses
-    distinct_statuses = db.session.query(Order.status).distinct().all()
-    status_labels = [status[0] for status in distinct_statuses] if distinct_statuses else ['Pending', 'Processing', 'Shipped', 'Delivered']
-
-    # Calculate sales and counts by status
-    from sqlalchemy import func
-    sales_data = []
-    order_counts = []
-    for status in status_labels:
-        sales = db.session.query(func.sum(Order.total)).filter(Order.status == status).scalar() or 0
-        count = Order.query.filter_by(status=status).count()
-        sales_data.append(sales)
-        order_counts.append(count)
-
-    # For backward compatibility, keep individual variables if needed
-    pending_orders = order_counts[status_labels.index('Pending')] if 'Pending' in status_labels else 0
-    processing_orders = order_counts[status_labels.index('Processing')] if 'Processing' in status_labels else 0
-    shipped_orders = order_counts[status_labels.index('Shipped')] if 'Shipped' in status_labels else 0
-    delivered_orders = order_counts[status_labels.index('Delivered')] if 'Delivered' in status_labels else 0
-
-    pending_sales = sales_data[status_labels.index('Pending')] if 'Pending' in status_labels else 0
-    processing_sales = sales_data[status_labels.index('Processing')] if 'Processing' in status_labels else 0
-    shipped_sales = sales_data[status_labels.index('Shipped')] if 'Shipped' in status_labels else 0
-    delivered_sales = sales_data[status_labels.index('Delivered')] if 'Delivered' in status_labels else 0
-    offers = Offer.query.order_by(Offer.id.desc()).all()
-    orders = Order.query.options(joinedload(Order.user), joinedload(Order.medicine)).order_by(Order.id.desc()).all()
-    prescriptions = Prescription.query.order_by(Prescription.id.desc()).all()
+    # The tab lists are fetched from api_table when each tab is opened
+    stats = dashboard_stats()
     pending_prescriptions = Prescription.query.filter_by(status='Doctor Approved').order_by(Prescription.id.desc()).limit(5).all()
-    users = User.query.filter_by(is_admin=False, is_doctor=False).all()
-    doctors = User.query.filter_by(is_doctor=True).all()
 
     return render_template('admin_dashboard.html',
-        medicines=medicines_with_discount,
-        total_meds=total_meds,
-        total_orders=total_orders,
-        total_users=total_users,
-        total_prescriptions=total_prescriptions,
-        pending_orders=pending_orders,
-        processing_orders=processing_orders,
-        shipped_orders=shipped_orders,
-        delivered_orders=delivered_orders,
-        pending_sales=pending_sales,
-        processing_sales=processing_sales,
-        shipped_sales=shipped_sales,
-        delivered_sales=delivered_sales,
-        status_labels=status_labels,
-        sales_data=sales_data,
-        order_counts=order_counts,
-        offers=offers,
-        orders=orders,
-        prescriptions=prescriptions,
         pending_prescriptions=pending_prescriptions,
-        users=users,
-        doctors=doctors
+        **stats
     )
 
+@admin_bp.route('/api/<name>')
+@login_required
+def api_table(name):
+    """One page of a dashboard tab as JSON, with the rows also rendered as HTML"""
+    if not current_user.is_admin:
+        abort(403)
+    if name not in TABLES:
+        abort(404)
+    page = table_page(name, request.args)
+    html = render_template(page.pop('template'), items=page.pop('items'))
+    return jsonify(dict(page, html=html))
+
+@admin_bp.route('/analytics/sales')
+@login_required
+def analytics_sales():
+    """Orders, units and revenue for a date range, grouped by day, status, medicine or category"""
+    if not current_user.is_admin:
+        abort(403)
+    try:
+        start = datetime.strptime(request.args['start'], '%Y-%m-%d').date() if request.args.get('start') else None
+        end = datetime.strptime(request.args['end'], '%Y-%m-%d').date() if request.args.get('end') else None
+    except ValueError:
+        return jsonify({'error': 'start and end must be YYYY-MM-DD'}), 400
+    group = request.args.get('group', 'day')
+    if group not in GROUPS:
+        return jsonify({'error': f"group must be one of {', '.join(GROUPS)}"}), 400
+    statuses = request.args.getlist('status')
+    report = sales_report(start, end, statuses, group)
+    return jsonify(dict(report, start=start.isoformat() if start else None, end=end.isoformat() if end else None,
+                        group=group, statuses=statuses))
+
 @admin_bp.route('/delete_medicine/<int:med_id>', methods=['POST'])
 @login_required
 def delete_medicine(med_id):
@@ -172,11 +146,13 @@ def delete_medicine(med_id):
     med = Medicine.query.get(med_id)
     if med:
         # Check if there are any orders for this medicine
-        if Order.query.filter_by(medicine_id=med_id).first():
+        if medicine_has_orders(med_id):
             flash("Cannot delete medicine as it has associated orders.")
             return redirect(url_for('admin.admin_dashboard'))
+        release_product_image(med.image)
         db.session.delete(med)
         db.session.commit()
+        invalidate_catalog([med_id])
         flash(f"{med.name} deleted!")
     return redirect(url_for('admin.admin_dashboard'))
 
@@ -188,6 +164,7 @@ def delete_offer(offer_id):
     offer = Offer.query.get_or_404(offer_id)
     db.session.delete(offer)
     db.session.commit()
+    invalidate_offers()
     flash("✅ Offer deleted!")
     return redirect(url_for('admin.admin_dashboard'))
 
@@ -205,6 +182,7 @@ def edit_offer(offer_id):
         offer.discount = int(request.form['discount'])
         offer.valid_until = datetime.strptime(request.form['valid_until'], '%Y-%m-%d')
         db.session.commit()
+        invalidate_offers()
         flash("✅ Offer updated successfully!")
         return redirect(url_for('admin.admin_dashboard'))
 
@@ -215,8 +193,11 @@ def edit_offer(offer_id):
 def view_orders():
     if not current_user.is_admin:
         return redirect(url_for('main.home'))
-    orders = Order.query.options(joinedload(Order.user), joinedload(Order.medicine)).order_by(Order.id.desc()).all()
-    return render_template('admin_orders.html', orders=orders)
+    # Filtered, sorted and paged in SQL; the filters stay in the query string
+    page = table_page('orders', request.args)
+    filters = {name: value for name, value in request.args.items() if value and name != 'page'}
+    return render_template('admin_orders.html', orders=page['items'], page=page, filters=filters,
+                           status_counts=order_status_counts(request.args))
 
 @admin_bp.route('/update_order_status/<int:order_id>', methods=['GET', 'POST'])
 @login_required
@@ -224,7 +205,7 @@ def update_order_status(order_id):
     if not current_user.is_admin:
         return redirect(url_for('main.home'))
 
-    order = Order.query.get(order_id)
+    order = OrderHeader.query.get(order_id)
     if order:
         if request.method == 'POST':
             new_status = request.form['status']
@@ -243,8 +224,6 @@ def update_order_status(order_id):
         else:
             order.status = new_status
 
-        db.session.commit()
-
         # जर status 'Rejected' असेल तर ईमेल पाठवा
         if new_status == 'Rejected':
             user = User.query.get(order.user_id)
@@ -254,6 +233,9 @@ def update_order_status(order_id):
                     subject='Order Rejected ❌',
                     body=f"Dear {user.email},\n\nWe're sorry to inform you that your order #{order.id} has been rejected.\n\n- Pharma Team"
                 )
+
+        db.session.commit()
+        invalidate_stats()
         flash('Order status updated!')
     return redirect(url_for('admin.view_orders'))
 
@@ -289,12 +271,12 @@ def edit_medicine(med_id):
 
         image_file = request.files.get('image')
         if image_file and image_file.filename:
-            filename = secure_filename(image_file.filename)
-            image_path = os.path.join('static/uploads', filename)
-            image_file.save(image_path)
-            medicine.image = '/static/uploads/' + filename
+            old_image = medicine.image
+            medicine.image = save_product_image(image_file)
+            release_product_image(old_image)
 
         db.session.commit()
+        invalidate_catalog([medicine.id])
         flash('Medicine updated successfully!')
         return redirect(url_for('admin.admin_dashboard'))
 
@@ -431,7 +413,6 @@ def update_prescription_status(prescription_id):
 
         prescription.admin_id = current_user.id
         prescription.reviewed_at = datetime.utcnow()
-        db.session.commit()
 
         # Send email based on status (only for non-delivered statuses)
         if new_status.lower() != 'delivered':
@@ -449,96 +430,47 @@ def update_prescription_status(prescription_id):
                         subject='Prescription Rejected ❌',
                         body=f"Dear {user.email},\n\nWe're sorry to inform you that your prescription #{prescription.id} has been rejected by the admin.\n\n- Pharma Team"
                     )
+        db.session.commit()
         flash('Prescription status updated!')
     return redirect(url_for('admin.admin_dashboard'))
 
-@admin_bp.route('/export_prescriptions_pdf')
-
+@admin_bp.route('/export_prescriptions_pdf', methods=['POST'])
 @login_required
-
 def export_prescriptions_pdf():
+    # The PDF is built by a report worker; this only queues it (or finds an
+    # identical recent one) and says where to poll
+    if not current_user.is_admin:
+        return jsonify({'error': 'Unauthorized'}), 403
+    job = request_report('prescriptions_pdf', report_params(request.form), current_user.id)
+    return jsonify(report_status(job)), 202
 
+@admin_bp.route('/reports/<int:job_id>')
+@login_required
+def report_job(job_id):
     if not current_user.is_admin:
+        return jsonify({'error': 'Unauthorized'}), 403
+    return jsonify(report_status(ReportJob.query.get_or_404(job_id)))
 
+@admin_bp.route('/reports/<int:job_id>/download')
+@login_required
+def download_report(job_id):
+    if not current_user.is_admin:
         return redirect(url_for('main.home'))
-
-
-
-    prescriptions = Prescription.query.order_by(Prescription.id.desc()).all()
-
-
-
-    buffer = BytesIO()
-
-    doc = SimpleDocTemplate(buffer, pagesize=letter)
-
-    elements = []
-
-
-
-    data = [['ID', 'Patient', 'Doctor', 'Medicine', 'Dosage', 'Status', 'Date']]
-
-    for p in prescriptions:
-
-        data.append([
-
-            str(p.id),
-
-            p.user.email,
-
-            p.doctor.email,
-
-            p.medicine,
-
-            p.dosage,
-
-            p.status,
-
-            p.submitted_at.strftime('%Y-%m-%d')
-
-        ])
-
-
-
-    table = Table(data)
-
-    table.setStyle(TableStyle([
-
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-
-        ('FONTSIZE', (0, 0), (-1, 0), 14),
-
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-
-        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-
-    ]))
-
-
-
-    elements.append(table)
-
-    doc.build(elements)
-
-
-
-    buffer.seek(0)
-
-    response = make_response(buffer.getvalue())
-
-    response.headers['Content-Type'] = 'application/pdf'
-
-    response.headers['Content-Disposition'] = 'attachment; filename=prescriptions.pdf'
-
-    return response
+    job = ReportJob.query.get_or_404(job_id)
+    if job.status != 'done' or not os.path.exists(report_path(job)):
+        abort(404)
+    return send_file(report_path(job), mimetype='application/pdf', as_attachment=True,
+                     download_name=f'{job.kind.replace("_pdf", "")}-{job.id}.pdf')
+
+def report_status(job):
+    return {
+        'id': job.id,
+        'status': job.status,
+        'rows': job.rows,
+        'error': job.error,
+        'status_url': url_for('admin.report_job', job_id=job.id),
+        'download_url': url_for('admin.download_report', job_id=job.id) if job.status == 'done' else None,
+    }
 
 @admin_bp.route('/verify_delivery_otp/<int:order_id>', methods=['POST'])
 @login_required
@@ -546,7 +478,7 @@ def verify_delivery_otp(order_id):
     if not current_user.is_admin:
         return redirect(url_for('main.home'))
 
-    order = Order.query.get_or_404(order_id)
+    order = OrderHeader.query.get_or_404(order_id)
     otp_input = request.form.get('otp')
 
     if not order.delivery_otp or not order.delivery_otp_expiry:
@@ -562,6 +494,7 @@ def verify_delivery_otp(order_id):
         order.delivery_otp = None  # Clear OTP after successful verification
         order.delivery_otp_expiry = None
         db.session.commit()
+        invalidate_stats()
         flash('Delivery confirmed successfully!')
     else:
         flash('Invalid OTP. Please try again.')
@@ -596,6 +529,33 @@ def verify_prescription_delivery_otp(prescription_id):
 
     return redirect(url_for('admin.admin_dashboard'))
 
+@admin_bp.route('/import_medicines', methods=['GET', 'POST'])
+@login_required
+def import_medicines():
+    if not current_user.is_admin:
+        return redirect(url_for('main.home'))
+
+    report = None
+    if request.method == 'POST':
+        file = request.files.get('file')
+        if not file or not file.filename:
+            flash('Please choose a CSV file to import.')
+            return redirect(url_for('admin.import_medicines'))
+        try:
+            report = import_medicine_rows(file.stream, dry_run=bool(request.form.get('dry_run')))
+        except ValueError as e:
+            db.session.rollback()
+            flash(str(e))
+            return redirect(url_for('admin.import_medicines'))
+        if report['dry_run']:
+            db.session.rollback()
+        else:
+            db.session.commit()
+            if report['inserted'] or report['updated']:
+                # New rows' ids aren't known, so listeners refresh everything
+                invalidate_catalog(None if report['inserted'] else report['ids'])
+    return render_template('admin_import.html', report=report)
+
 @admin_bp.route('/bulk_delete_medicines', methods=['POST'])
 @login_required
 def bulk_delete_medicines():
@@ -612,14 +572,16 @@ def bulk_delete_medicines():
         med = Medicine.query.get(int(med_id))
         if med:
             # Check if there are any orders for this medicine
-            if Order.query.filter_by(medicine_id=int(med_id)).first():
+            if medicine_has_orders(int(med_id)):
                 flash(f"Cannot delete {med.name} as it has associated orders.")
                 continue
+            release_product_image(med.image)
             db.session.delete(med)
             deleted_count += 1
 
     db.session.commit()
     if deleted_count > 0:
+        invalidate_catalog(medicine_ids)
         flash(f'Successfully deleted {deleted_count} medicine(s)!')
     return redirect(url_for('admin.admin_dashboard'))
 
@@ -628,37 +590,24 @@ def bulk_delete_medicines():
 def export_medicines():
     if not current_user.is_admin:
         return redirect(url_for('main.home'))
+    ids = [int(id) for id in request.args.getlist('ids') if id.isdigit()]
+    return csv_response('medicines.csv', MEDICINE_HEADER, medicine_rows(request.args, ids),
+                        compress=request.args.get('gzip') == '1')
 
-    ids = request.args.getlist('ids')
-    if ids:
-        medicines = Medicine.query.filter(Medicine.id.in_([int(id) for id in ids])).all()
-    else:
-        medicines = Medicine.query.all()
-
-    # Create CSV content
-    import csv
-    from io import StringIO
-
-    output = StringIO()
-    writer = csv.writer(output)
-    writer.writerow(['ID', 'Medicine Name', 'Brand Name', 'Type', 'Category', 'Price', 'Discount', 'Stock', 'Description'])
-
-    for med in medicines:
-        writer.writerow([
-            med.id,
-            med.medicine_name,
-            med.name,
-            med.type,
-            med.category,
-            med.price,
-            med.discount,
-            med.stock,
-            med.description.replace('\n', ' ').replace('\r', '')  # Clean description
-        ])
-
-    output.seek(0)
-    response = make_response(output.getvalue())
-    response.headers['Content-Type'] = 'text/csv'
-    response.headers['Content-Disposition'] = 'attachment; filename=medicines.csv'
-    return response
+@admin_bp.route('/export_orders')
+@login_required
+def export_orders():
+    if not current_user.is_admin:
+        return redirect(url_for('main.home'))
+    # Same filters as the order list (status, start, end, customer, medicine, q)
+    return csv_response('orders.csv', ORDER_HEADER, order_rows(request.args),
+                        compress=request.args.get('gzip') == '1')
+
+@admin_bp.route('/export_prescriptions')
+@login_required
+def export_prescriptions():
+    if not current_user.is_admin:
+        return redirect(url_for('main.home'))
+    return csv_response('prescriptions.csv', PRESCRIPTION_HEADER, prescription_rows(request.args),
+                        compress=request.args.get('gzip') == '1')
 
@@ -5,9 +5,6 @@ from models import db, User
 from utils import send_email
 import random
 from datetime import datetime, timedelta
-import smtplib
-from email.mime.text import MIMEText
-from config import EMAIL_USER, EMAIL_PASS
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -29,22 +26,9 @@ def register():
         otp_expiry = datetime.utcnow() + timedelta(minutes=10)
         user = User(email=email, phone=phone, password=password, otp=otp, otp_expiry=otp_expiry, is_verified=False)
         db.session.add(user)
+        # Send OTP to email (queued, goes out with the commit)
+        send_email(email, 'Pharma Registration OTP', f'Your OTP for registration is: {otp}')
         db.session.commit()
-        # Send OTP to email
-        try:
-            msg = MIMEText(f'Your OTP for registration is: {otp}')
-            msg['Subject'] = 'Pharma Registration OTP'
-            msg['From'] = EMAIL_USER
-            msg['To'] = email
-            with smtplib.SMTP_SSL('smtp.gmail.com', 465) as server:
-                server.login(EMAIL_USER, EMAIL_PASS)
-                server.sendmail(EMAIL_USER, [email], msg.as_string())
-        except Exception as e:
-            print('OTP Email Error:', e)
-            flash('Failed to send OTP email. Please try again.')
-            db.session.delete(user)
-            db.session.commit()
-            return redirect(url_for('auth.register'))
         session['pending_user_id'] = user.id
         flash('OTP sent to your email. Please verify.')
         return redirect(url_for('auth.verify_otp'))
@@ -105,21 +89,9 @@ def forgot_password():
         otp_expiry = datetime.utcnow() + timedelta(minutes=10)
         user.otp = otp
         user.otp_expiry = otp_expiry
+        # Send OTP to email (queued, goes out with the commit)
+        send_email(email, 'Password Reset OTP', f'Your OTP for password reset is: {otp}')
         db.session.commit()
-        # Send OTP to email
-        try:
-            msg = MIMEText(f'Your OTP for password reset is: {otp}')
-            msg['Subject'] = 'Password Reset OTP'
-            msg['From'] = EMAIL_USER
-            msg['To'] = email
-            with smtplib.SMTP('smtp.gmail.com', 587) as server:
-                server.starttls()
-                server.login(EMAIL_USER, EMAIL_PASS)
-                server.sendmail(EMAIL_USER, [email], msg.as_string())
-        except Exception as e:
-            print('OTP Email Error:', e)
-            flash('Failed to send OTP email. Please try again.')
-            return redirect(url_for('auth.forgot_password'))
         session['reset_user_id'] = user.id
         flash('OTP sent to your email. Please verify.')
         return redirect(url_for('auth.verify_reset_otp'))
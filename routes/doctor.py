@@ -63,15 +63,15 @@ def doctor_reject(prescription_id):
     prescription.doctor_id = current_user.id
     prescription.reviewed_at = datetime.utcnow()
     prescription.rejection_reason = request.form.get('notes', '')
-    db.session.commit()
     
-    # Send rejection email to user
+    # Send rejection email to user (queued, goes out after the commit)
     user = prescription.user
     send_email(
         to_email=user.email,
         subject='Prescription Rejected',
         body=f"Dear {user.email},\n\nYour prescription has been rejected by the doctor.\n\nReason: {prescription.rejection_reason}\n\nPlease contact support if you have any questions.\n\n- Pharma Team"
     )
+    db.session.commit()
     flash('Prescription rejected and email sent to user.', 'danger')
     
     return redirect(url_for('doctor.doctor_dashboard'))
@@ -1,13 +1,29 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify
 from flask_login import login_required, current_user
-from models import db, Medicine, Order, Offer, Prescription
-import os
-from werkzeug.utils import secure_filename
+from datetime import datetime
+from sqlalchemy.orm import selectinload
+from models import db, Medicine, OrderHeader, OrderLine, Prescription
 from utils import send_order_email
+from services.catalog import cached_page, filters_from_args, invalidate_catalog, PAGE_SIZE
+from services.facets import facet_counts
+from services.fragments import render_card
+from services.images import image_variants
+from services.storage import store_upload
+from services.pricing import quote_cart
+from services.cart import get_cart, add_item, clear_user_cart, remove_items, merge_session_cart
+from services.stock import release_expired_reservations, orderable_lines, reserve_lines, secure_lines
+from services.orders import create_order, timeline_page
+from services.digest import digest_enabled, order_placed
+from services.http_cache import conditional_catalog
+from services.offers import active_offers
+from services.suggest import suggest
 
 main_bp = Blueprint('main', __name__)
+main_bp.add_app_template_global(render_card)
+main_bp.add_app_template_global(image_variants)
 
 @main_bp.route('/', methods=['GET', 'POST'])
+@conditional_catalog
 def home():
     if request.method == 'POST':
         # Handle POST request logic here
@@ -15,69 +31,100 @@ def home():
         return redirect(url_for('main.home'))
 
     # Existing GET logic
-    search_query = request.args.get('search', '')
-    category_filter = request.args.get('category', '')
-    brand_filter = request.args.get('brand', '')
-
-    medicines_query = Medicine.query
-
-    if search_query:
-        medicines_query = medicines_query.filter(
-            (Medicine.name.ilike(f'%{search_query}%')) |
-            (Medicine.medicine_name.ilike(f'%{search_query}%'))
-        )
-
-    if category_filter:
-        medicines_query = medicines_query.filter(Medicine.category.ilike(f'%{category_filter}%'))
-
-    if brand_filter:
-        medicines_query = medicines_query.filter(Medicine.name.ilike(f'%{brand_filter}%'))
-
-    medicines = medicines_query.all()
-    offers = Offer.query.all()
-
-    return render_template('home.html', medicines=medicines, offers=offers)
+    return render_catalog(filters_from_args(request.args))
 
 @main_bp.route('/category/<category>')
+@conditional_catalog
 def category_filter(category):
-    medicines = Medicine.query.filter(Medicine.category.ilike(f"%{category}%")).all()
-    offers = Offer.query.all()
-    return render_template('home.html', medicines=medicines, offers=offers)
+    return render_catalog(filters_from_args(request.args, category=category))
+
+@main_bp.route('/api/medicines')
+@conditional_catalog
+def api_medicines():
+    # "Load more" endpoint: one keyset page of cards, as JSON plus ready-made HTML
+    page = cached_page(
+        filters_from_args(request.args),
+        after=request.args.get('after'),
+        limit=request.args.get('limit', PAGE_SIZE)
+    )
+    page = dict(page, html=render_template('medicine_cards.html', medicines=page['items']))
+    return jsonify(page)
+
+@main_bp.route('/api/facets')
+@conditional_catalog
+def api_facets():
+    filters = filters_from_args(request.args)
+    return jsonify(facet_counts(**filters))
+
+@main_bp.route('/api/suggest')
+def api_suggest():
+    query = request.args.get('q', '')
+    limit = request.args.get('limit', 10, type=int)
+    return jsonify({'query': query, 'suggestions': suggest(query, limit)})
+
+def render_catalog(filters):
+    page = cached_page(filters)
+    offers = active_offers()
+    facets = facet_counts(**filters)
+    active_filters = {name: value for name, value in filters.items() if value}
+    api_url = url_for('main.api_medicines', **active_filters)
+    return render_template('home.html', medicines=page['items'], next_cursor=page['next_cursor'], api_url=api_url,
+                           offers=offers, facets=facets, filters=active_filters)
 
 @main_bp.route('/add_to_cart/<int:med_id>', methods=['POST'])
 @login_required
 def add_to_cart(med_id):
     quantity = int(request.form['quantity'])
-    cart = session.get('cart', {})
-    cart[str(med_id)] = cart.get(str(med_id), 0) + quantity
-    session['cart'] = cart
+    merge_session_cart(current_user.id, session)
+    add_item(current_user.id, med_id, quantity)
+    db.session.commit()
     flash('Item added to cart!')
     return redirect(url_for('main.home'))
 
 @main_bp.route('/cart')
 @login_required
 def cart():
-    cart = session.get('cart', {})
-    items = []
-    total = 0
-    for med_id, qty in cart.items():
-        med = Medicine.query.get(int(med_id))
-        if med:
-            items.append({'medicine': med, 'quantity': qty, 'subtotal': med.price * qty})
-            total += med.price * qty
-    return render_template('cart.html', items=items, total=total)
+    merge_session_cart(current_user.id, session)
+    quote = quote_cart(get_cart(current_user.id))
+    return render_template('cart.html', items=quote.lines, total=quote.total)
 
 @main_bp.route('/clear_cart')
 @login_required
 def clear_cart():
     session.pop('cart', None)
+    clear_user_cart(current_user.id)
+    db.session.commit()
     flash('Cart cleared!')
     return redirect(url_for('main.cart'))
 
+@main_bp.route('/checkout/reserve', methods=['POST'])
+@login_required
+def reserve_checkout():
+    # Hold the stock while the customer fills in the checkout form. Only on
+    # POST, so reloads, prefetchers and crawlers never lock inventory.
+    merge_session_cart(current_user.id, session)
+    cart = get_cart(current_user.id)
+    if not cart:
+        flash('Cart is empty!')
+        return redirect(url_for('main.home'))
+
+    released = release_expired_reservations()
+    quote = quote_cart(cart)
+    reserved = reserve_lines(current_user.id, quote.lines)
+    db.session.commit()
+    invalidate_catalog(released | set(cart))
+    if not reserved:
+        flash('Sorry, the items in your cart are out of stock.')
+        return redirect(url_for('main.cart'))
+    if len(reserved) < len(quote.lines):
+        flash('Some items in your cart are out of stock and will not be ordered.')
+    return redirect(url_for('main.checkout'))
+
 @main_bp.route('/checkout', methods=['GET', 'POST'])
 @login_required
 def checkout():
-    cart = session.get('cart', {})
+    merge_session_cart(current_user.id, session)
+    cart = get_cart(current_user.id)
     if not cart:
         flash('Cart is empty!')
         return redirect(url_for('main.home'))
@@ -88,95 +135,84 @@ def checkout():
             flash('Please provide a delivery address!', 'error')
             return render_template('checkout.html', items=[], total=0)
 
+        released = release_expired_reservations()
+        # Held lines use their reservation; the rest (added or resized after
+        # reserving) take whatever stock is left
+        quote = quote_cart(cart)
+        lines = secure_lines(current_user.id, quote.lines)
+        if not lines:
+            db.session.commit()
+            invalidate_catalog(released | set(cart))
+            flash('Sorry, the items in your cart are out of stock.')
+            return redirect(url_for('main.cart'))
+
         prescription_filename = None
         if 'prescription' in request.files:
             file = request.files['prescription']
             if file and file.filename:
-                filename = secure_filename(file.filename)
-                filepath = os.path.join('static/uploads', filename)
-                os.makedirs('static/uploads', exist_ok=True)
-                file.save(filepath)
-                prescription_filename = filename
-
-        order_details_list = []
-        for med_id_str, qty in cart.items():
-            med_id = int(med_id_str)
-            medicine = Medicine.query.get(med_id)
-            if medicine and medicine.stock >= qty:
-                discounted_price = medicine.price * (1 - medicine.discount / 100)
-                subtotal = discounted_price * qty
-                order = Order(
-                    user_id=current_user.id,
-                    medicine_id=med_id,
-                    quantity=qty,
-                    address=address,
-                    prescription=prescription_filename,
-                    status='Pending',
-                    total=subtotal
-                )
-                db.session.add(order)
-
-                # Update stock
-                medicine.stock -= qty
-                if medicine.stock < 0:
-                    medicine.stock = 0
-
-                order_details_list.append(f"{medicine.name} x{qty} - ₹{subtotal} (Original: ₹{medicine.price * qty}, Discount: {medicine.discount}%)")
+                prescription_filename = store_upload(file)
+        order = create_order(current_user.id, address, prescription_filename, lines)
+        order_details_list = [line.summary for line in lines]
+        # Lines that couldn't get stock stay in the cart
+        remove_items(current_user.id, {line.medicine.id for line in lines})
+        db.session.flush()
+
+        # Email to admin goes out with the order, from the outbox; in digest mode the
+        # order waits for the next digest instead
+        if not digest_enabled():
+            order_details = f'New Order #{order.id} from {current_user.email}\nAddress: {address}\nItems:\n' + '\n'.join(order_details_list)
+            if prescription_filename:
+                order_details += f'\nPrescription: {prescription_filename}'
+            send_order_email('admin@pharma.com', order_details)  # Assuming admin email
+            order.admin_notified_at = datetime.utcnow()
 
         db.session.commit()
+        invalidate_catalog(released | set(cart))
+        order_placed()
 
-        # Send email to admin
-        order_details = f'New Order from {current_user.email}\nAddress: {address}\nItems:\n' + '\n'.join(order_details_list)
-        if prescription_filename:
-            order_details += f'\nPrescription: {prescription_filename}'
-        send_order_email('admin@pharma.com', order_details)  # Assuming admin email
-
-        # Clear cart
-        session.pop('cart', None)
         flash('✅ Order placed successfully!')
+        if len(lines) < len(quote.lines):
+            flash('Some items ran out of stock before the order was placed; they are still in your cart.')
         return redirect(url_for('main.my_orders'))
 
-    # GET request
-    items = []
-    total = 0
-    for med_id, qty in cart.items():
-        med = Medicine.query.get(int(med_id))
-        if med:
-            discounted_price = med.price * (1 - med.discount / 100)
-            subtotal = discounted_price * qty
-            items.append({'medicine': med, 'quantity': qty, 'subtotal': subtotal})
-            total += subtotal
-    return render_template('checkout.html', items=items, total=total)
+    # GET request: read-only; stock is held by reserve_checkout. The page
+    # shows (and totals) the lines an order could get stock for right now
+    lines = orderable_lines(current_user.id, quote_cart(cart).lines)
+    return render_template('checkout.html', items=lines, total=round(sum(line.subtotal for line in lines), 2))
 
 @main_bp.route('/myorders')
 @login_required
 def my_orders():
-    orders_raw = Order.query.filter_by(user_id=current_user.id).order_by(Order.id.desc()).all()
-    prescriptions = Prescription.query.filter_by(user_id=current_user.id).order_by(Prescription.id.desc()).all()
+    before = request.args.get('before')
+    entries, next_cursor = timeline_page(current_user.id, before=before)
+
+    # Details for just this page's entries, in bounded IN queries
+    order_ids = [entry.id for entry in entries if entry.kind == 'order']
+    prescription_ids = [entry.id for entry in entries if entry.kind == 'prescription']
+    orders_by_id = {order.id: order for order in OrderHeader.query.filter(OrderHeader.id.in_(order_ids))
+                    .options(selectinload(OrderHeader.lines).joinedload(OrderLine.medicine))} if order_ids else {}
+    prescriptions_by_id = {p.id: p for p in Prescription.query.filter(Prescription.id.in_(prescription_ids))} if prescription_ids else {}
 
     orders = []
-    for order in orders_raw:
-        med = Medicine.query.get(order.medicine_id)
-        if med:
+    prescriptions = []
+    all_items = []
+    for entry in entries:
+        if entry.kind == 'order' and entry.id in orders_by_id:
+            order = orders_by_id[entry.id]
             order_data = {
                 'order': order,
-                'medicines': [{'image': med.image, 'name': med.name, 'quantity': order.quantity}]
+                'medicines': [{'image': line.medicine.image, 'name': line.medicine.name, 'quantity': line.quantity}
+                              for line in order.lines if line.medicine]
             }
             orders.append(order_data)
+            all_items.append(order_data)
+        elif entry.id in prescriptions_by_id:
+            prescription = prescriptions_by_id[entry.id]
+            prescriptions.append(prescription)
+            all_items.append({'prescription': prescription, 'type': 'prescription'})
 
-    prescription_orders = []
-    for prescription in prescriptions:
-        prescription_data = {
-            'prescription': prescription,
-            'type': 'prescription'
-        }
-        prescription_orders.append(prescription_data)
-
-    # Combine and sort by date (most recent first)
-    all_items = orders + prescription_orders
-    all_items.sort(key=lambda x: x['order'].ordered_at if 'order' in x else x['prescription'].submitted_at, reverse=True)
-
-    return render_template('my_orders.html', orders=orders, prescriptions=prescriptions, all_items=all_items)
+    return render_template('my_orders.html', orders=orders, prescriptions=prescriptions, all_items=all_items,
+                           next_cursor=next_cursor, paged=bool(before))
 
 @main_bp.route('/order', methods=['GET'])
 @login_required
@@ -187,7 +223,8 @@ def order_page():
 @main_bp.route('/place_order', methods=['POST'])
 @login_required
 def place_order():
-    cart = session.get('cart', {})
+    merge_session_cart(current_user.id, session)
+    cart = get_cart(current_user.id)
     if not cart:
         flash('Your cart is empty!', 'error')
         return redirect(url_for('main.cart'))
@@ -197,55 +234,43 @@ def place_order():
         flash('Please provide a delivery address!', 'error')
         return redirect(url_for('main.checkout'))
 
+    released = release_expired_reservations()
+    quote = quote_cart(cart)
+    lines = secure_lines(current_user.id, quote.lines)
+    if not lines:
+        db.session.commit()
+        invalidate_catalog(released | set(cart))
+        flash('Sorry, the items in your cart are out of stock.', 'error')
+        return redirect(url_for('main.cart'))
+
     prescription_filename = None
     if 'prescription' in request.files:
         file = request.files['prescription']
         if file and file.filename:
-            filename = secure_filename(file.filename)
-            filepath = os.path.join('static/uploads', filename)
-            os.makedirs('static/uploads', exist_ok=True)
-            file.save(filepath)
-            prescription_filename = filename
-
-    orders = []
-    order_details_list = []
-    grand_total = 0
-    for med_id_str, quantity in cart.items():
-        med_id = int(med_id_str)
-        med = Medicine.query.get(med_id)
-        if med and med.stock >= quantity:
-            discounted_price = med.price * (1 - med.discount / 100)
-            subtotal = discounted_price * quantity
-            order = Order(
-                user_id=current_user.id,
-                medicine_id=med_id,
-                quantity=quantity,
-                address=address,
-                prescription=prescription_filename,
-                status='Pending',
-                total=subtotal
-            )
-            db.session.add(order)
-            orders.append(order)
-            order_details_list.append(f"{med.name} x{quantity} - ₹{subtotal} (Original: ₹{med.price * quantity}, Discount: {med.discount}%)")
-            grand_total += subtotal
-
-            # Update stock
-            med.stock -= quantity
-            if med.stock < 0:
-                med.stock = 0
+            prescription_filename = store_upload(file)
+    order = create_order(current_user.id, address, prescription_filename, lines)
+    order_details_list = [line.summary for line in lines]
+    grand_total = order.total
+    # Lines that couldn't get stock stay in the cart
+    remove_items(current_user.id, {line.medicine.id for line in lines})
+    db.session.flush()
+
+    # Email to admin goes out with the order, from the outbox; in digest mode the
+    # order waits for the next digest instead
+    if not digest_enabled():
+        order_details = f'New Order #{order.id} from {current_user.email}\nAddress: {address}\nGrand Total: ₹{grand_total}\nItems:\n' + '\n'.join(order_details_list)
+        if prescription_filename:
+            order_details += f'\nPrescription: {prescription_filename}'
+        send_order_email('admin@pharma.com', order_details)  # Assuming admin email
+        order.admin_notified_at = datetime.utcnow()
 
     db.session.commit()
+    invalidate_catalog(released | set(cart))
+    order_placed()
 
-    # Send email to admin
-    order_details = f'New Order(s) from {current_user.email}\nAddress: {address}\nGrand Total: ₹{grand_total}\nItems:\n' + '\n'.join(order_details_list)
-    if prescription_filename:
-        order_details += f'\nPrescription: {prescription_filename}'
-    send_order_email('admin@pharma.com', order_details)  # Assuming admin email
-
-    # Clear cart
-    session['cart'] = {}
-    flash(f'Your order(s) have been placed successfully! Order ID(s): {[o.id for o in orders]}', 'success')
+    flash(f'Your order has been placed successfully! Order ID: {order.id}', 'success')
+    if len(lines) < len(quote.lines):
+        flash('Some items ran out of stock before the order was placed; they are still in your cart.')
     return redirect(url_for('main.my_orders'))
 
 @main_bp.route('/upload_prescription', methods=['GET', 'POST'])
@@ -254,13 +279,9 @@ def upload_prescription():
     if request.method == 'POST':
         file = request.files['prescription']
         if file:
-            filename = secure_filename(file.filename)
-            filepath = os.path.join('static/uploads', filename)
-            os.makedirs('static/uploads', exist_ok=True)
-            file.save(filepath)
             prescription = Prescription(
                 user_id=current_user.id,
-                file_path=filename,
+                file_path=store_upload(file),
                 disease=request.form.get('disease'),
                 symptoms=request.form.get('symptoms'),
                 prescription_details=request.form.get('prescription_details'),
@@ -0,0 +1,247 @@
+# services/admin_tables.py
+from datetime import datetime, timedelta
+from sqlalchemy import func, or_
+from sqlalchemy.orm import aliased, joinedload, selectinload
+from models import db, Medicine, OrderHeader, OrderLine, Offer, Prescription, User
+from services.catalog import medicine_card
+from services.orders import line_items
+
+PAGE_SIZE = 25
+MAX_PAGE_SIZE = 100
+
+
+def _date_arg(args, name):
+    """A YYYY-MM-DD request arg as a datetime, or None when missing or malformed"""
+    try:
+        return datetime.strptime(args.get(name) or '', '%Y-%m-%d')
+    except ValueError:
+        return None
+
+
+def _search(query, args, *columns):
+    term = (args.get('q') or '').strip()
+    if not term:
+        return query
+    return query.filter(or_(*[column.ilike(f'%{term}%') for column in columns]))
+
+
+def _status(query, args, column):
+    status = (args.get('status') or '').strip()
+    if not status:
+        return query
+    # Statuses are stored title-cased but some older rows are lower-case; an
+    # IN over the spellings keeps the status index usable
+    return query.filter(column.in_({status, status.lower(), status.title()}))
+
+
+def _medicines(args):
+    query = _search(Medicine.query, args, Medicine.name, Medicine.medicine_name, Medicine.description)
+    if args.get('category'):
+        query = query.filter(Medicine.category == args['category'])
+    stock = args.get('stock')
+    if stock == 'in-stock':
+        query = query.filter(Medicine.stock > 10)
+    elif stock == 'low-stock':
+        query = query.filter(Medicine.stock > 0, Medicine.stock <= 10)
+    elif stock == 'out-of-stock':
+        query = query.filter(Medicine.stock <= 0)
+    return query
+
+
+def filter_orders(query, args, with_status=True):
+    term = (args.get('q') or '').strip()
+    if term:
+        customers = User.query.with_entities(User.id).filter(User.email.ilike(f'%{term}%'))
+        match = OrderHeader.user_id.in_(customers)
+        # "#42" or "42" also finds the order by number
+        if term.lstrip('#').isdigit():
+            match = or_(match, OrderHeader.id == int(term.lstrip('#')))
+        query = query.filter(match)
+    customer = (args.get('customer') or '').strip()
+    if customer:
+        query = query.filter(OrderHeader.user_id.in_(
+            User.query.with_entities(User.id).filter(User.email.ilike(f'%{customer}%'))))
+    medicine = (args.get('medicine') or '').strip()
+    if medicine:
+        query = query.filter(OrderHeader.lines.any(OrderLine.medicine_id.in_(
+            Medicine.query.with_entities(Medicine.id).filter(
+                or_(Medicine.name.ilike(f'%{medicine}%'), Medicine.medicine_name.ilike(f'%{medicine}%'))))))
+    # Date range on ordered_at, both ends inclusive
+    start, end = _date_arg(args, 'start'), _date_arg(args, 'end')
+    if start:
+        query = query.filter(OrderHeader.ordered_at >= start)
+    if end:
+        query = query.filter(OrderHeader.ordered_at < end + timedelta(days=1))
+    return _status(query, args, OrderHeader.status) if with_status else query
+
+
+def _orders(args):
+    query = OrderHeader.query.options(joinedload(OrderHeader.user),
+                                      selectinload(OrderHeader.lines).joinedload(OrderLine.medicine))
+    return filter_orders(query, args)
+
+
+def _offers(args):
+    return _search(Offer.query, args, Offer.title, Offer.description)
+
+
+def _prescriptions(args):
+    query = Prescription.query.options(joinedload(Prescription.user), joinedload(Prescription.doctor))
+    term = (args.get('q') or '').strip()
+    if term:
+        patient, doctor = aliased(User), aliased(User)
+        query = (query.outerjoin(patient, Prescription.user_id == patient.id)
+                 .outerjoin(doctor, Prescription.doctor_id == doctor.id)
+                 .filter(or_(patient.email.ilike(f'%{term}%'), doctor.email.ilike(f'%{term}%'),
+                             Prescription.address.ilike(f'%{term}%'))))
+    start, end = _date_arg(args, 'start'), _date_arg(args, 'end')
+    if start:
+        query = query.filter(Prescription.submitted_at >= start)
+    if end:
+        query = query.filter(Prescription.submitted_at < end + timedelta(days=1))
+    return _status(query, args, Prescription.status)
+
+
+def _users(args):
+    query = User.query.filter_by(is_admin=False, is_doctor=False)
+    return _search(query, args, User.email, User.phone)
+
+
+def _order_row(order):
+    return {
+        'id': order.id,
+        'customer': order.user.email if order.user else None,
+        'total': order.total or 0,
+        'status': order.status,
+        'ordered_at': order.ordered_at.isoformat() if order.ordered_at else None,
+        'address': order.address,
+        'lines': line_items(order),
+    }
+
+
+def _offer_row(offer):
+    return {
+        'id': offer.id,
+        'title': offer.title,
+        'description': offer.description,
+        'discount': offer.discount,
+        'valid_until': offer.valid_until.isoformat() if offer.valid_until else None,
+    }
+
+
+def _prescription_row(prescription):
+    return {
+        'id': prescription.id,
+        'patient': prescription.user.email if prescription.user else None,
+        'doctor': prescription.doctor.email if prescription.doctor else None,
+        'status': prescription.status,
+        'submitted_at': prescription.submitted_at.isoformat() if prescription.submitted_at else None,
+        'file_path': prescription.file_path,
+    }
+
+
+def _user_row(user):
+    return {
+        'id': user.id,
+        'email': user.email,
+        'phone': user.phone,
+        'is_verified': bool(user.is_verified),
+        'created_at': user.created_at.isoformat() if user.created_at else None,
+    }
+
+
+# Per tab: the filtered query, the sort options (first one is the default),
+# the row template and the JSON shape of one row
+TABLES = {
+    'medicines': {
+        'query': _medicines,
+        'sorts': {
+            'name': [Medicine.name, Medicine.id],
+            'price': [Medicine.price, Medicine.id],
+            'stock': [Medicine.stock.desc(), Medicine.id],
+            'category': [Medicine.category, Medicine.name, Medicine.id],
+            'newest': [Medicine.id.desc()],
+        },
+        'template': 'admin_tab_medicines.html',
+        'row': medicine_card,
+    },
+    'orders': {
+        'query': _orders,
+        'sorts': {
+            'newest': [OrderHeader.id.desc()],
+            'oldest': [OrderHeader.id],
+            'total': [OrderHeader.total.desc(), OrderHeader.id.desc()],
+            'status': [OrderHeader.status, OrderHeader.id.desc()],
+        },
+        'template': 'admin_tab_orders.html',
+        'row': _order_row,
+    },
+    'offers': {
+        'query': _offers,
+        'sorts': {
+            'newest': [Offer.id.desc()],
+            'valid_until': [Offer.valid_until, Offer.id],
+            'discount': [Offer.discount.desc(), Offer.id.desc()],
+        },
+        'template': 'admin_tab_offers.html',
+        'row': _offer_row,
+    },
+    'prescriptions': {
+        'query': _prescriptions,
+        'sorts': {
+            'newest': [Prescription.id.desc()],
+            'oldest': [Prescription.id],
+            'status': [Prescription.status, Prescription.id.desc()],
+        },
+        'template': 'admin_tab_prescriptions.html',
+        'row': _prescription_row,
+    },
+    'users': {
+        'query': _users,
+        'sorts': {
+            'newest': [User.id.desc()],
+            'oldest': [User.id],
+            'email': [User.email, User.id],
+        },
+        'template': 'admin_tab_users.html',
+        'row': _user_row,
+    },
+}
+
+
+def filtered_query(name, args):
+    """A tab's query with the request's filters applied, unsorted and unpaged"""
+    return TABLES[name]['query'](args)
+
+
+def table_page(name, args):
+    """One filtered, sorted page of an admin dashboard tab.
+
+    args are the request args: page, per_page, sort, q and the tab's own
+    filters. Unknown sorts fall back to the tab's default. Raises KeyError
+    for an unknown tab.
+    """
+    table = TABLES[name]
+    sort = args.get('sort') if args.get('sort') in table['sorts'] else next(iter(table['sorts']))
+    per_page = max(1, min(args.get('per_page', PAGE_SIZE, type=int) or PAGE_SIZE, MAX_PAGE_SIZE))
+    page = max(1, args.get('page', 1, type=int) or 1)
+    pagination = (table['query'](args)
+                  .order_by(*table['sorts'][sort])
+                  .paginate(page=page, per_page=per_page, error_out=False))
+    return {
+        'items': pagination.items,
+        'rows': [table['row'](item) for item in pagination.items],
+        'page': pagination.page,
+        'pages': pagination.pages,
+        'per_page': per_page,
+        'total': pagination.total,
+        'sort': sort,
+        'template': table['template'],
+    }
+
+
+def order_status_counts(args):
+    """Orders per status for the current order filters (ignoring the status filter itself)"""
+    query = filter_orders(db.session.query(OrderHeader.status, func.count(OrderHeader.id)), args, with_status=False)
+    query = query.group_by(OrderHeader.status).order_by(OrderHeader.status)
+    return [(status, count) for status, count in query]
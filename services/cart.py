@@ -0,0 +1,58 @@
+# services/cart.py
+from sqlalchemy.dialects import sqlite, postgresql
+from models import db, Cart
+
+_UPSERT_INSERTS = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}
+
+
+def get_cart(user_id):
+    """The user's cart as {medicine id: quantity}, in one indexed query"""
+    rows = db.session.query(Cart.med_id, Cart.quantity).filter(Cart.user_id == user_id)
+    return {med_id: quantity for med_id, quantity in rows}
+
+
+def add_item(user_id, med_id, quantity):
+    """Add quantity of a medicine to the cart, creating the line if needed.
+
+    A single INSERT ... ON CONFLICT DO UPDATE on the (user_id, med_id)
+    index, so concurrent adds can't create duplicate lines. The caller
+    commits.
+    """
+    insert = _UPSERT_INSERTS.get(db.engine.dialect.name)
+    if insert is None:
+        line = Cart.query.filter_by(user_id=user_id, med_id=med_id).first()
+        if line:
+            line.quantity += quantity
+        else:
+            db.session.add(Cart(user_id=user_id, med_id=med_id, quantity=quantity))
+        return
+
+    stmt = insert(Cart).values(user_id=user_id, med_id=med_id, quantity=quantity)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Cart.user_id, Cart.med_id],
+        set_={'quantity': Cart.quantity + stmt.excluded.quantity}
+    )
+    db.session.execute(stmt)
+
+
+def clear_user_cart(user_id):
+    """Remove every line from the user's cart; the caller commits"""
+    Cart.query.filter_by(user_id=user_id).delete(synchronize_session=False)
+
+
+def remove_items(user_id, med_ids):
+    """Remove just these medicines from the user's cart; the caller commits"""
+    if med_ids:
+        Cart.query.filter(Cart.user_id == user_id, Cart.med_id.in_(list(med_ids))) \
+            .delete(synchronize_session=False)
+
+
+def merge_session_cart(user_id, session):
+    """Move a cart left in the session cookie (pre-database carts) into the table"""
+    if 'cart' not in session:
+        return  # don't touch (and re-sign) the cookie on every request
+    legacy = session.pop('cart')
+    if legacy:
+        for med_id, quantity in legacy.items():
+            add_item(user_id, int(med_id), int(quantity))
+        db.session.commit()
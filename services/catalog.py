@@ -0,0 +1,179 @@
+# services/catalog.py
+from sqlalchemy import or_, and_, func
+from models import Medicine
+from services.search import apply_search, medicine_fts
+from services.cache import TTLCache, catalog_version, bump_catalog_version
+
+PAGE_SIZE = 24
+MAX_PAGE_SIZE = 60
+
+# Popular search/category/brand pages are served from memory. Keys carry the
+# catalog version, so admin writes make old entries unreachable at once; the
+# TTL bounds staleness for writes made by other worker processes.
+CACHE_SIZE = 512
+CACHE_TTL = 300
+_page_cache = TTLCache(maxsize=CACHE_SIZE, ttl=CACHE_TTL)
+
+
+def medicine_card(med):
+    """Plain-dict snapshot of the fields the catalog cards and JSON API need"""
+    return {
+        'id': med.id,
+        'medicine_name': med.medicine_name,
+        'name': med.name,
+        'type': med.type,
+        'age_group': med.age_group,
+        'category': med.category,
+        'price': med.price,
+        'discount': med.discount or 0,
+        'stock': med.stock,
+        'image': med.image or '',
+        'description': med.description or '',
+    }
+
+
+def page_size(value):
+    """Clamp a user-supplied page size to 1..MAX_PAGE_SIZE"""
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return PAGE_SIZE
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def encode_cursor(med_id, rank=None):
+    if rank is None:
+        return str(med_id)
+    return f'{rank!r}:{med_id}'
+
+
+def decode_cursor(cursor):
+    """Return (rank, med_id) from a cursor string, or (None, None) if it's invalid"""
+    if not cursor:
+        return None, None
+    try:
+        if ':' in cursor:
+            rank, med_id = cursor.split(':', 1)
+            return float(rank), int(med_id)
+        return None, int(cursor)
+    except ValueError:
+        return None, None
+
+
+# Query-string parameters understood by the catalog pages
+FILTERS = ('search', 'category', 'brand', 'type', 'age_group')
+
+
+def filters_from_args(args, **overrides):
+    """Pick the catalog filters out of request.args (plus fixed overrides)"""
+    filters = {name: args.get(name, '') for name in FILTERS}
+    filters.update(overrides)
+    return filters
+
+
+def catalog_query(filters):
+    """Build the filtered Medicine query shared by the catalog pages.
+
+    Returns (query, ranked); see services.search.apply_search.
+    """
+    query = Medicine.query
+    ranked = False
+
+    if filters.get('search'):
+        query, ranked = apply_search(query, filters['search'])
+
+    if filters.get('category'):
+        query = query.filter(Medicine.category.ilike(f"%{filters['category']}%"))
+
+    if filters.get('brand'):
+        query = query.filter(Medicine.name.ilike(f"%{filters['brand']}%"))
+
+    if filters.get('type'):
+        query = query.filter(func.lower(Medicine.type) == filters['type'].lower())
+
+    if filters.get('age_group'):
+        query = query.filter(func.lower(Medicine.age_group) == filters['age_group'].lower())
+
+    if not ranked:
+        query = query.order_by(Medicine.id)
+    return query, ranked
+
+
+def fetch_page(filters, after=None, limit=PAGE_SIZE):
+    """Fetch one page of catalog cards using keyset pagination.
+
+    Rows are ordered by relevance then id when searching, and by id
+    otherwise. `after` is the next_cursor of the previous page, so each page
+    reads at most limit + 1 rows no matter how deep the user scrolls.
+    """
+    limit = page_size(limit)
+    query, ranked = catalog_query(filters)
+    after_rank, after_id = decode_cursor(after)
+
+    if ranked:
+        query = query.add_columns(medicine_fts.c.rank)
+        if after_id is not None and after_rank is not None:
+            query = query.filter(or_(
+                medicine_fts.c.rank > after_rank,
+                and_(medicine_fts.c.rank == after_rank, Medicine.id > after_id)
+            ))
+        rows = query.limit(limit + 1).all()
+    else:
+        if after_id is not None:
+            query = query.filter(Medicine.id > after_id)
+        rows = [(med, None) for med in query.limit(limit + 1).all()]
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = None
+    if has_more:
+        last_med, last_rank = rows[-1]
+        next_cursor = encode_cursor(last_med.id, last_rank)
+
+    return {
+        'items': [medicine_card(med) for med, _ in rows],
+        'next_cursor': next_cursor,
+    }
+
+
+def normalize_filters(filters):
+    """Canonical filters so equivalent requests share a cache entry"""
+    return {name: ' '.join((filters.get(name) or '').lower().split()) for name in FILTERS}
+
+
+def cached_page(filters, after=None, limit=PAGE_SIZE):
+    """fetch_page() through the versioned result cache"""
+    filters = normalize_filters(filters)
+    limit = page_size(limit)
+    key = ('page', catalog_version(), tuple(filters.values()), after or None, limit)
+    return _page_cache.get_or_set(
+        key, lambda: fetch_page(filters, after=after, limit=limit)
+    )
+
+
+# Callbacks interested in catalog writes, e.g. in-memory indexes that can
+# update themselves row by row instead of rebuilding from scratch.
+_listeners = []
+
+
+def on_catalog_change(callback):
+    """Register callback(med_ids) to be run by invalidate_catalog().
+
+    med_ids is a set of medicine ids, or None when anything may have changed.
+    """
+    _listeners.append(callback)
+    return callback
+
+
+def invalidate_catalog(med_ids=None):
+    """Call after committing any change to medicines (or their stock).
+
+    Pass the ids of the medicines that were added, edited or deleted when
+    they're known so listeners can refresh just those rows.
+    """
+    bump_catalog_version()
+    _page_cache.clear()
+    if med_ids is not None:
+        med_ids = {int(med_id) for med_id in med_ids}
+    for callback in _listeners:
+        callback(med_ids)
@@ -0,0 +1,104 @@
+# services/catalog_state.py
+import threading
+from datetime import datetime
+from sqlalchemy import event, insert, select, update
+from sqlalchemy.orm import Session
+from models import db, CatalogState, Medicine, Offer
+from services.catalog import invalidate_catalog
+from services.offers import invalidate_offers
+
+# Which shared version a write to each model moves
+AREAS = {Medicine: 'catalog', Offer: 'offers'}
+
+_lock = threading.Lock()
+_seen = {}  # name -> (version, changed_at) this process's caches are up to date with
+
+
+def _bump(session, names):
+    """Move the shared versions in the session's transaction.
+
+    The versions this transaction moved from and to are kept in
+    session.info, so the commit can tell whether anyone else wrote in
+    between.
+    """
+    now = datetime.utcnow()
+    connection = session.connection()
+    bumps = session.info.setdefault('catalog_bumps', {})
+    for name in names:
+        version = connection.execute(
+            update(CatalogState).where(CatalogState.name == name)
+            .values(version=CatalogState.version + 1, changed_at=now)
+            .returning(CatalogState.version)
+        ).scalar()
+        if version is None:
+            version = 1
+            connection.execute(insert(CatalogState).values(name=name, version=version, changed_at=now))
+        # The row stays locked until commit, so our bumps are consecutive
+        start = bumps[name][0] if name in bumps else version - 1
+        bumps[name] = (start, version, now)
+
+
+@event.listens_for(Session, 'after_flush')
+def _flushed(session, flush_context):
+    changed = (*session.new, *[obj for obj in session.dirty if session.is_modified(obj)], *session.deleted)
+    names = {AREAS[type(obj)] for obj in changed if type(obj) in AREAS}
+    if names:
+        _bump(session, sorted(names))
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _bulk_statement(orm_execute_state):
+    # Bulk UPDATE/INSERT/DELETE statements (stock decrements, CSV imports)
+    # never reach the flush, so they bump the version here, in their transaction
+    if orm_execute_state.is_select or orm_execute_state.bind_mapper is None:
+        return
+    name = AREAS.get(orm_execute_state.bind_mapper.class_)
+    if name:
+        _bump(orm_execute_state.session, [name])
+
+
+@event.listens_for(Session, 'after_commit')
+def _committed(session):
+    # Our own writes don't make this process's caches stale: whoever made
+    # them calls invalidate_catalog/invalidate_offers with what changed.
+    # If another process wrote since our last sync, _seen stays behind and
+    # the next sync still drops everything.
+    bumps = session.info.pop('catalog_bumps', None)
+    if not bumps:
+        return
+    with _lock:
+        for name, (start, version, changed_at) in bumps.items():
+            seen = _seen.get(name)
+            if seen is not None and seen[0] == start:
+                _seen[name] = (version, changed_at)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _rolled_back(session):
+    # Savepoints too: their bumps are gone, so the recorded range is wrong
+    session.info.pop('catalog_bumps', None)
+
+
+def shared_versions():
+    """{name: (version, changed_at)} as committed by any process"""
+    rows = db.session.execute(select(CatalogState.name, CatalogState.version, CatalogState.changed_at))
+    return {name: (version, changed_at) for name, version, changed_at in rows}
+
+
+def sync_catalog_state():
+    """Shared versions, after dropping this process's caches if another process moved them"""
+    versions = shared_versions()
+    stale = set()
+    with _lock:
+        for name, state in versions.items():
+            seen = _seen.get(name)
+            # The first sync in a process drops whatever was cached before
+            # it; a read older than our own last commit changes nothing
+            if seen is None or state[0] > seen[0]:
+                _seen[name] = state
+                stale.add(name)
+    if 'catalog' in stale:
+        invalidate_catalog()
+    if 'offers' in stale:
+        invalidate_offers()
+    return versions
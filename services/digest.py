@@ -0,0 +1,134 @@
+# services/digest.py
+import threading
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import func, update
+from config import ADMIN_EMAIL
+from models import db, Medicine, OrderHeader, OrderLine, User
+from services.outbox import queue_email
+
+# How often the digest thread looks at the waiting orders
+POLL_SECONDS = 30
+# Orders listed one by one in the email; the per-medicine totals always cover all of them
+MAX_LISTED_ORDERS = 50
+
+_wake = threading.Event()
+_worker = []
+
+
+def digest_enabled():
+    return current_app.config.get('ADMIN_DIGEST_MINUTES', 0) > 0
+
+
+def order_placed():
+    """Called after a new order is committed, so a full digest goes out without waiting"""
+    _wake.set()
+
+
+def _claim(now):
+    """Take the un-notified orders for this digest; None if another worker got there first"""
+    ids = [order_id for (order_id,) in db.session.query(OrderHeader.id)
+           .filter(OrderHeader.admin_notified_at.is_(None))
+           .order_by(OrderHeader.id)]
+    if not ids:
+        return []
+    result = db.session.execute(
+        update(OrderHeader)
+        .where(OrderHeader.id.in_(ids), OrderHeader.admin_notified_at.is_(None))
+        .values(admin_notified_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != len(ids):
+        db.session.rollback()
+        return None
+    return ids
+
+
+def digest_body(ids):
+    orders = (db.session.query(OrderHeader.id, OrderHeader.ordered_at, OrderHeader.total,
+                               OrderHeader.prescription, User.email)
+              .join(User, User.id == OrderHeader.user_id)
+              .filter(OrderHeader.id.in_(ids))
+              .order_by(OrderHeader.id).all())
+    per_medicine = (db.session.query(Medicine.name, func.sum(OrderLine.quantity), func.sum(OrderLine.subtotal))
+                    .join(Medicine, Medicine.id == OrderLine.medicine_id)
+                    .filter(OrderLine.order_id.in_(ids))
+                    .group_by(Medicine.id, Medicine.name)
+                    .order_by(func.sum(OrderLine.subtotal).desc()).all())
+
+    grand_total = sum(order.total or 0 for order in orders)
+    customers = len({order.email for order in orders})
+    times = [order.ordered_at for order in orders if order.ordered_at] or [datetime.utcnow()]
+    first, last = min(times), max(times)
+    medicine_lines = [f'  {name} x{quantity} - ₹{subtotal:.2f}' for name, quantity, subtotal in per_medicine]
+    order_lines = [
+        f"  #{order.id} {order.email} - ₹{order.total or 0:.2f}{' (prescription)' if order.prescription else ''}"
+        for order in orders[:MAX_LISTED_ORDERS]
+    ]
+    if len(orders) > MAX_LISTED_ORDERS:
+        order_lines.append(f'  ... and {len(orders) - MAX_LISTED_ORDERS} more')
+
+    return f'''
+Hello Admin,
+
+{len(orders)} new order(s) from {customers} customer(s) between {first:%d %b %H:%M} and {last:%d %b %H:%M} UTC.
+Grand Total: ₹{grand_total:.2f}
+
+💊 Totals per medicine:
+''' + '\n'.join(medicine_lines) + '''
+
+🛍️ Orders:
+''' + '\n'.join(order_lines) + '''
+
+Please check the admin dashboard for full details.
+
+Thanks,
+Your Website Bot 🤖
+'''
+
+
+def queue_digest(force=False):
+    """Queue one digest email for the waiting orders if the window or count is reached.
+
+    The orders are marked notified in the same transaction as the outbox
+    row, so each order lands in exactly one digest. Returns how many orders
+    the digest covered (0 if nothing was due).
+    """
+    now = datetime.utcnow()
+    waiting, oldest = (db.session.query(func.count(OrderHeader.id), func.min(OrderHeader.ordered_at))
+                       .filter(OrderHeader.admin_notified_at.is_(None)).one())
+    if not waiting:
+        return 0
+    window = timedelta(minutes=current_app.config.get('ADMIN_DIGEST_MINUTES', 0))
+    due = (force or waiting >= current_app.config.get('ADMIN_DIGEST_MAX_ORDERS', 50)
+           or oldest is None or oldest <= now - window)
+    if not due:
+        return 0
+
+    ids = _claim(now)
+    if not ids:
+        return 0
+    queue_email(ADMIN_EMAIL, f'📦 Order Digest - {len(ids)} new order(s)', digest_body(ids))
+    db.session.commit()
+    return len(ids)
+
+
+def _run(app):
+    while True:
+        _wake.wait(POLL_SECONDS)
+        _wake.clear()
+        with app.app_context():
+            try:
+                queue_digest()
+            except Exception as e:
+                print('Digest Error:', e)
+                db.session.rollback()
+
+
+def start_digest_worker(app):
+    """One digest thread per process, only when digest mode is on"""
+    if _worker or app.config.get('ADMIN_DIGEST_MINUTES', 0) <= 0:
+        return
+    worker = threading.Thread(target=_run, args=(app,), name='order-digest', daemon=True)
+    worker.start()
+    _worker.append(worker)
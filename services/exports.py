@@ -0,0 +1,131 @@
+# services/exports.py
+import csv
+import io
+import zlib
+from flask import Response, stream_with_context
+from models import db, Medicine, OrderHeader, OrderLine, Prescription, User
+from services.admin_tables import filter_orders, filtered_query
+
+# Rows read per query. Each batch is its own short read, so a slow download
+# never holds SQLite's read lock (which would stall checkouts) for long.
+BATCH_SIZE = 500
+
+
+def batched_rows(query, key, key_of, to_row):
+    """to_row() of every row of query in ascending key order, BATCH_SIZE rows per round-trip.
+
+    Rows are converted before the read transaction is ended, so nothing is
+    lazy-loaded afterwards, and only one batch is ever held in memory.
+    """
+    last = None
+    while True:
+        batch = query if last is None else query.filter(key > last)
+        rows = batch.order_by(key).limit(BATCH_SIZE).all()
+        if not rows:
+            return
+        last = key_of(rows[-1])
+        converted = [to_row(row) for row in rows]
+        db.session.rollback()
+        yield from converted
+        if len(rows) < BATCH_SIZE:
+            return
+
+
+def _timestamp(value):
+    return value.strftime('%Y-%m-%d %H:%M') if value else ''
+
+
+def _clean(value):
+    if value is None:
+        return ''
+    if isinstance(value, str):
+        return value.replace('\r', '').replace('\n', ' ')
+    return value
+
+
+def csv_chunks(header, rows):
+    """Encoded CSV: the header straight away, then a chunk per BATCH_SIZE rows"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def take():
+        text = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return text.encode('utf-8')
+
+    writer.writerow(header)
+    yield take()
+    for count, row in enumerate(rows, 1):
+        writer.writerow([_clean(value) for value in row])
+        if count % BATCH_SIZE == 0:
+            yield take()
+    if buffer.tell():
+        yield take()
+
+
+def gzip_chunks(chunks):
+    """Compress a stream of byte chunks into one gzip file, chunk by chunk"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        # Sync-flush each chunk so the client gets data as soon as it is read
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+
+MEDICINE_HEADER = ['ID', 'Medicine Name', 'Brand Name', 'Type', 'Age Group', 'Category', 'Price', 'Discount', 'Stock',
+                   'Description']
+
+
+def medicine_rows(args, ids=None):
+    query = filtered_query('medicines', args)
+    if ids:
+        query = query.filter(Medicine.id.in_(ids))
+    return batched_rows(query, Medicine.id, lambda med: med.id, lambda med: [
+        med.id, med.medicine_name, med.name, med.type, med.age_group, med.category, med.price, med.discount,
+        med.stock, med.description
+    ])
+
+
+ORDER_HEADER = ['Order ID', 'Ordered At', 'Status', 'Customer Email', 'Address', 'Order Total',
+                'Medicine ID', 'Brand Name', 'Medicine Name', 'Quantity', 'Unit Price', 'Subtotal']
+
+
+def order_rows(args):
+    """One row per order line, with the order and customer repeated on each"""
+    query = (db.session.query(OrderLine.id, OrderHeader.id, OrderHeader.ordered_at, OrderHeader.status,
+                              User.email, OrderHeader.address, OrderHeader.total, OrderLine.medicine_id,
+                              Medicine.name, Medicine.medicine_name, OrderLine.quantity, OrderLine.unit_price,
+                              OrderLine.subtotal)
+             .select_from(OrderLine)
+             .join(OrderHeader, OrderHeader.id == OrderLine.order_id)
+             .outerjoin(User, User.id == OrderHeader.user_id)
+             .outerjoin(Medicine, Medicine.id == OrderLine.medicine_id))
+    return batched_rows(filter_orders(query, args), OrderLine.id, lambda row: row[0], lambda row: [
+        row[1], _timestamp(row[2]), *row[3:]
+    ])
+
+
+PRESCRIPTION_HEADER = ['ID', 'Patient', 'Doctor', 'Status', 'Submitted At', 'Reviewed At', 'Disease', 'Symptoms',
+                       'Medicine', 'Dosage', 'Address', 'Doctor Notes', 'File']
+
+
+def prescription_rows(args):
+    return batched_rows(filtered_query('prescriptions', args), Prescription.id, lambda p: p.id, lambda p: [
+        p.id, p.user.email if p.user else '', p.doctor.email if p.doctor else '', p.status,
+        _timestamp(p.submitted_at), _timestamp(p.reviewed_at), p.disease, p.symptoms, p.medicine, p.dosage,
+        p.address, p.doctor_notes, p.file_path
+    ])
+
+
+def csv_response(filename, header, rows, compress=False):
+    """A streamed CSV download; compress=True sends it as filename.gz"""
+    chunks = csv_chunks(header, rows)
+    mimetype = 'text/csv'
+    if compress:
+        chunks, mimetype, filename = gzip_chunks(chunks), 'application/gzip', filename + '.gz'
+    response = Response(stream_with_context(chunks), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename={filename}'
+    # Keep proxies from buffering the whole file before passing it on
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,207 @@
+# services/facets.py
+import threading
+import time
+from models import Medicine
+from services.cache import TTLCache, catalog_version
+from services.catalog import on_catalog_change, CACHE_SIZE, CACHE_TTL
+from services.search import search_ids
+
+# facet name -> Medicine column. Category and brand keep the substring
+# semantics the old ILIKE filters had; type and age group match exactly.
+FACETS = {
+    'category': Medicine.category,
+    'type': Medicine.type,
+    'age_group': Medicine.age_group,
+    'brand': Medicine.name,
+}
+SUBSTRING_FACETS = {'category', 'brand'}
+
+MAX_VALUES = {'brand': 15}
+
+# Full rebuild at least this often, to pick up writes from other workers
+REBUILD_SECONDS = 300
+
+
+def _norm(value):
+    return ' '.join((value or '').lower().split())
+
+
+class FacetIndex:
+    """Per-facet-value bitsets over the catalog.
+
+    Every medicine gets a bit position; each facet value keeps a Python int
+    with the bits of the medicines that have it. Filtering and counting are
+    then bitwise ANDs and popcounts instead of one query per facet.
+    """
+
+    def __init__(self):
+        self.positions = {}   # med_id -> bit position
+        self.live = 0         # bits of medicines that still exist
+        self.bits = {facet: {} for facet in FACETS}     # facet -> value -> bitset
+        self.labels = {facet: {} for facet in FACETS}   # facet -> value -> display label
+        self.values = {}      # med_id -> {facet: value}
+
+    def add(self, med_id, row):
+        self.remove(med_id)
+        pos = self.positions.setdefault(med_id, len(self.positions))
+        bit = 1 << pos
+        self.live |= bit
+        self.values[med_id] = {}
+        for facet, label in row.items():
+            value = _norm(label)
+            self.values[med_id][facet] = value
+            self.bits[facet][value] = self.bits[facet].get(value, 0) | bit
+            self.labels[facet].setdefault(value, label)
+
+    def remove(self, med_id):
+        pos = self.positions.get(med_id)
+        if pos is None or med_id not in self.values:
+            return
+        bit = 1 << pos
+        self.live &= ~bit
+        for facet, value in self.values.pop(med_id).items():
+            remaining = self.bits[facet][value] & ~bit
+            if remaining:
+                self.bits[facet][value] = remaining
+            else:
+                del self.bits[facet][value]
+                del self.labels[facet][value]
+
+    def ids_bits(self, med_ids):
+        bits = 0
+        for med_id in med_ids:
+            pos = self.positions.get(med_id)
+            if pos is not None:
+                bits |= 1 << pos
+        return bits & self.live
+
+    def selection_bits(self, facet, selected):
+        selected = _norm(selected)
+        if facet in SUBSTRING_FACETS:
+            bits = 0
+            for value, value_bits in self.bits[facet].items():
+                if selected in value:
+                    bits |= value_bits
+            return bits
+        return self.bits[facet].get(selected, 0)
+
+    def counts(self, base, selections):
+        """Facet value counts for the rows in `base` narrowed by `selections`.
+
+        Each facet is counted with every *other* selection applied, so the
+        counts show what picking a different value would return.
+        """
+        masks = {facet: self.selection_bits(facet, value)
+                 for facet, value in selections.items() if value}
+        result = {}
+        for facet in FACETS:
+            mask = base
+            for other, other_bits in masks.items():
+                if other != facet:
+                    mask &= other_bits
+            counts = []
+            for value, value_bits in self.bits[facet].items():
+                count = (mask & value_bits).bit_count()
+                if count:
+                    counts.append({'value': self.labels[facet][value], 'count': count})
+            counts.sort(key=lambda c: (-c['count'], c['value'].lower()))
+            result[facet] = counts[:MAX_VALUES.get(facet)]
+        return result
+
+
+# Matching ids per search, keyed like the catalog page cache so cached pages
+# don't go back to the database for their facet counts
+_ids_cache = TTLCache(maxsize=CACHE_SIZE, ttl=CACHE_TTL)
+
+_lock = threading.Lock()
+# Held by whichever request is rebuilding; the others keep using the old index
+_build_lock = threading.Lock()
+_index = None
+_built_at = 0.0
+_dirty = set()
+_generation = 0  # bumped by full invalidations, so a build that overlaps one is redone
+
+
+def _rows(query):
+    return query.with_entities(Medicine.id, *FACETS.values())
+
+
+def _add_row(index, row):
+    med_id, *labels = row
+    index.add(med_id, dict(zip(FACETS, labels)))
+
+
+def _build():
+    # One query for every facet of every medicine
+    index = FacetIndex()
+    for row in _rows(Medicine.query).yield_per(1000):
+        _add_row(index, row)
+    return index
+
+
+def _rebuild(wait):
+    """Build a fresh index outside _lock and swap it in.
+
+    With wait=False this gives up at once if another request is already
+    rebuilding. Rows touched while the build runs stay in _dirty and are
+    applied to the new index on the next lookup.
+    """
+    global _index, _built_at
+    if not _build_lock.acquire(blocking=wait):
+        return
+    try:
+        with _lock:
+            if _index is not None and time.monotonic() - _built_at <= REBUILD_SECONDS:
+                return  # someone else rebuilt it while we waited
+            _dirty.clear()
+            generation = _generation
+        index = _build()
+        with _lock:
+            _index = index
+            _built_at = time.monotonic() if generation == _generation else 0.0
+    finally:
+        _build_lock.release()
+
+
+def facet_counts(search='', **selections):
+    """Counts per value of each facet for the current search and selections.
+
+    selections are facet=value keyword arguments (category, type,
+    age_group, brand); empty values are ignored.
+    """
+    search = _norm(search)
+    # The search query runs outside the lock so searches don't queue behind it
+    ids = _ids_cache.get_or_set(('ids', catalog_version(), search),
+                                lambda: frozenset(search_ids(search))) if search else None
+    with _lock:
+        missing = _index is None
+        stale = not missing and time.monotonic() - _built_at > REBUILD_SECONDS
+    if missing or stale:
+        # Only the very first lookup (or one after a full invalidation) waits
+        _rebuild(wait=missing)
+    with _lock:
+        if _index is None:
+            return {facet: [] for facet in FACETS}
+        if _dirty and not _build_lock.locked():
+            # Re-read only the rows admins touched since the last lookup
+            ids_touched = list(_dirty)
+            _dirty.clear()
+            found = set()
+            for row in _rows(Medicine.query.filter(Medicine.id.in_(ids_touched))):
+                _add_row(_index, row)
+                found.add(row[0])
+            for med_id in set(ids_touched) - found:
+                _index.remove(med_id)
+        base = _index.ids_bits(ids) if search else _index.live
+        return _index.counts(base, selections)
+
+
+@on_catalog_change
+def _catalog_changed(med_ids):
+    global _index, _generation
+    with _lock:
+        if med_ids is None:
+            _index = None
+            _generation += 1
+        else:
+            _dirty.update(med_ids)
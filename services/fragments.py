@@ -0,0 +1,35 @@
+# services/fragments.py
+from flask import current_app
+from markupsafe import Markup
+from services.cache import TTLCache
+from services.catalog import on_catalog_change
+
+CARD_TEMPLATE = 'medicine_card.html'
+
+# medicine id -> (row version, rendered card HTML)
+_cards = TTLCache(maxsize=5000, ttl=3600)
+
+
+def row_version(card):
+    """Changes whenever any field shown on the card changes"""
+    return hash(tuple(sorted(card.items())))
+
+
+def render_card(card):
+    """Rendered HTML for one catalog card, reused until that medicine changes"""
+    version = row_version(card)
+    cached = _cards.get(card['id'])
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    html = Markup(current_app.jinja_env.get_template(CARD_TEMPLATE).render(med=card))
+    _cards.set(card['id'], (version, html))
+    return html
+
+
+@on_catalog_change
+def _catalog_changed(med_ids):
+    if med_ids is None:
+        _cards.clear()
+    else:
+        for med_id in med_ids:
+            _cards.pop(med_id)
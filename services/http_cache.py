@@ -0,0 +1,74 @@
+# services/http_cache.py
+import hashlib
+from datetime import datetime, timezone
+from functools import wraps
+from flask import request, session, make_response
+from flask_login import current_user
+from services.catalog_state import sync_catalog_state
+from services.offers import active_offers, offers_expired_at
+
+# Anonymous catalog pages are identical for everyone, so browsers and proxies
+# may reuse them briefly; signed-in pages (navbar, cart) must be revalidated.
+PUBLIC_MAX_AGE = 60
+# Last-Modified for a catalog that has never been written to
+NEVER_CHANGED = datetime(2000, 1, 1)
+
+
+def catalog_etag(versions):
+    """ETag for the shared catalog/offers state, query string and viewer.
+
+    Built only from database state, so every worker process gives the same
+    ETag for the same page.
+    """
+    viewer = current_user.get_id() if current_user.is_authenticated else 'anon'
+    catalog, offers = (versions.get(name, (0, None))[0] for name in ('catalog', 'offers'))
+    raw = f'{catalog}:{offers}:{offers_expired_at().isoformat()}:{viewer}:{request.full_path}'
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def catalog_last_modified(versions):
+    changed_at = max([changed_at for _, changed_at in versions.values()] + [offers_expired_at(), NEVER_CHANGED])
+    return changed_at.replace(microsecond=0, tzinfo=timezone.utc)
+
+
+def conditional_catalog(view):
+    """Answer repeat GETs of a catalog view with 304 Not Modified.
+
+    The view only runs when the catalog, the active offers, the query string
+    or the signed-in user changed since the client's copy.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        # Pages carrying flash messages are one-off, never cache them
+        if request.method != 'GET' or session.get('_flashes'):
+            return view(*args, **kwargs)
+
+        # Drops this process's caches if another process changed the catalog,
+        # so a page rendered below always matches the ETag it is sent with
+        versions = sync_catalog_state()
+        active_offers()  # notices an offer that just expired
+        etag = catalog_etag(versions)
+        last_modified = catalog_last_modified(versions)
+
+        if request.if_none_match:
+            not_modified = request.if_none_match.contains(etag)
+        elif request.if_modified_since and not current_user.is_authenticated:
+            not_modified = last_modified <= request.if_modified_since
+        else:
+            not_modified = False
+
+        if not_modified:
+            response = make_response('', 304)
+        else:
+            response = make_response(view(*args, **kwargs))
+        response.set_etag(etag)
+        response.last_modified = last_modified
+        if current_user.is_authenticated:
+            response.cache_control.private = True
+            response.cache_control.no_cache = True
+        else:
+            response.cache_control.public = True
+            response.cache_control.max_age = PUBLIC_MAX_AGE
+        response.vary.add('Cookie')
+        return response
+    return wrapper
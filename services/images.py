@@ -0,0 +1,97 @@
+# services/images.py
+import os
+from services.storage import UPLOAD_DIR, store_upload, release
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is optional; without it we just serve originals
+    Image = None
+
+UPLOAD_URL = '/static/uploads/'
+
+# Cards show images in a 180px box; 360 covers 2x (retina) screens.
+THUMB_SIZES = (180, 360)
+JPEG_QUALITY = 82
+WEBP_QUALITY = 80
+
+
+def variant_name(filename, size, fmt):
+    stem = os.path.splitext(filename)[0]
+    return f'{stem}-{size}.{fmt}'
+
+
+def save_product_image(file):
+    """Save an uploaded product image in the content-addressed store.
+
+    Returns the image URL stored on Medicine.image. Thumbnails and WebP
+    variants are generated next to the original so catalog pages can
+    serve a few KB instead of the full upload.
+    """
+    path = store_upload(file)
+    generate_derivatives(os.path.join(UPLOAD_DIR, path))
+    return UPLOAD_URL + path
+
+
+def release_product_image(url):
+    """Drop the store reference held by a Medicine.image URL"""
+    if url and url.startswith(UPLOAD_URL):
+        release(url[len(UPLOAD_URL):])
+
+
+def generate_derivatives(path):
+    """Write <name>-<size>.jpg and <name>-<size>.webp for each THUMB_SIZES entry"""
+    if Image is None:
+        return []
+    written = []
+    directory, filename = os.path.split(path)
+    try:
+        with Image.open(path) as original:
+            original.load()
+            for size in THUMB_SIZES:
+                thumb = original.copy()
+                thumb.thumbnail((size, size))
+                if thumb.mode not in ('RGB', 'RGBA'):
+                    thumb = thumb.convert('RGBA' if 'transparency' in thumb.info else 'RGB')
+                webp_path = os.path.join(directory, variant_name(filename, size, 'webp'))
+                if not os.path.exists(webp_path):
+                    thumb.save(webp_path, 'WEBP', quality=WEBP_QUALITY, method=6)
+                    written.append(webp_path)
+                jpeg_path = os.path.join(directory, variant_name(filename, size, 'jpg'))
+                if not os.path.exists(jpeg_path):
+                    # JPEG has no alpha channel, flatten onto white
+                    if thumb.mode == 'RGBA':
+                        background = Image.new('RGB', thumb.size, (255, 255, 255))
+                        background.paste(thumb, mask=thumb.split()[-1])
+                        thumb = background
+                    thumb.save(jpeg_path, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+                    written.append(jpeg_path)
+    except (OSError, ValueError) as e:
+        print('Thumbnail Error:', e)
+    return written
+
+
+def image_variants(url):
+    """src/srcset values for a product image URL, for use in <picture> tags.
+
+    Falls back to the original URL when no derivatives exist (e.g. images
+    uploaded before the pipeline, or Pillow isn't installed).
+    """
+    variants = {'src': url, 'webp': '', 'jpeg': ''}
+    if not url or not url.startswith(UPLOAD_URL):
+        return variants
+    directory = os.path.join(UPLOAD_DIR, os.path.dirname(url[len(UPLOAD_URL):]))
+    filename = os.path.basename(url)
+    base_url = url[:len(url) - len(filename)]
+    webp, jpeg = [], []
+    for density, size in enumerate(THUMB_SIZES, start=1):
+        webp_name = variant_name(filename, size, 'webp')
+        jpeg_name = variant_name(filename, size, 'jpg')
+        if os.path.exists(os.path.join(directory, webp_name)):
+            webp.append(f'{base_url}{webp_name} {density}x')
+        if os.path.exists(os.path.join(directory, jpeg_name)):
+            jpeg.append(f'{base_url}{jpeg_name} {density}x')
+    if jpeg:
+        variants['src'] = jpeg[0].split(' ')[0]
+    variants['webp'] = ', '.join(webp)
+    variants['jpeg'] = ', '.join(jpeg)
+    return variants
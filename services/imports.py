@@ -0,0 +1,199 @@
+# services/imports.py
+import csv
+import io
+from sqlalchemy import insert, tuple_, update
+from models import db, Medicine
+from services.images import UPLOAD_URL, release_product_image
+
+# Rows are looked up and written this many at a time
+CHUNK_SIZE = 1000
+# Errors kept for the report; the rest are only counted
+MAX_ERRORS = 500
+
+# Column -> the headers it may appear under, compared case-insensitively with
+# underscores read as spaces. Field names and the labels of the medicines CSV
+# export are both accepted, so an export can be edited and imported again.
+COLUMNS = {
+    'medicine_name': ('medicine name',),
+    'name': ('name', 'brand name', 'brand'),
+    'type': ('type',),
+    'age_group': ('age group',),
+    'category': ('category',),
+    'price': ('price',),
+    'discount': ('discount',),
+    'stock': ('stock',),
+    'image': ('image',),
+    'description': ('description',),
+}
+# Needed to create a medicine; an update only needs the key
+REQUIRED = ('medicine_name', 'name', 'type', 'age_group', 'category', 'price', 'stock')
+KEY = ('medicine_name', 'name')
+
+
+def _text(limit):
+    def parse(value):
+        if len(value) > limit:
+            raise ValueError(f'longer than {limit} characters')
+        return value
+    return parse
+
+
+def _image(value):
+    # Uploaded images are reference-counted by the store; pointing medicines
+    # at them from a CSV would skip that bookkeeping
+    if value.startswith(UPLOAD_URL):
+        raise ValueError('uploaded images can only be set from the medicine form')
+    return _text(200)(value)
+
+
+def _number(kind, low, high=None):
+    def parse(value):
+        try:
+            number = kind(value)
+        except ValueError:
+            raise ValueError('not a number' if kind is float else 'not a whole number')
+        if number < low or (high is not None and number > high):
+            raise ValueError(f'must be at least {low}' if high is None else f'must be between {low} and {high}')
+        return number
+    return parse
+
+
+PARSERS = {
+    'medicine_name': _text(100),
+    'name': _text(100),
+    'type': _text(50),
+    'age_group': _text(50),
+    'category': _text(50),
+    'price': _number(float, 0),
+    'discount': _number(int, 0, 100),
+    'stock': _number(int, 0),
+    'image': _image,
+    'description': str,
+}
+
+
+def _header_map(header):
+    """CSV column index -> medicine field, for the headers we recognise"""
+    aliases = {alias: field for field, names in COLUMNS.items() for alias in names}
+    fields = {}
+    for index, label in enumerate(header):
+        field = aliases.get(' '.join(label.lower().replace('_', ' ').split()))
+        if field and field not in fields.values():
+            fields[index] = field
+    return fields
+
+
+def _parse(cells, fields):
+    """The non-blank values of one CSV row, or raises ValueError naming the bad column"""
+    values = {}
+    for index, field in fields.items():
+        value = cells[index].strip() if index < len(cells) else ''
+        if not value:
+            continue
+        try:
+            values[field] = PARSERS[field](value)
+        except ValueError as e:
+            raise ValueError(f'{field}: {e}')
+    missing = [field for field in KEY if field not in values]
+    if missing:
+        raise ValueError('missing ' + ', '.join(missing))
+    return values
+
+
+def _existing(keys):
+    """(medicine_name, name) -> {id: image} of the medicines already stored under it"""
+    found = {}
+    rows = (db.session.query(Medicine.id, Medicine.medicine_name, Medicine.name, Medicine.image)
+            .filter(tuple_(Medicine.medicine_name, Medicine.name).in_(list(keys))))
+    for med_id, medicine_name, name, image in rows:
+        found.setdefault((medicine_name, name), {})[med_id] = image
+    return found
+
+
+def import_medicines(stream, dry_run=False):
+    """Create or update medicines from a CSV file, keyed by (medicine_name, name).
+
+    stream is a binary file object; it is read one row at a time. Rows are
+    validated, then written CHUNK_SIZE at a time as executemany INSERTs for
+    new medicines and bulk UPDATEs by id for existing ones. Blank cells
+    leave an existing medicine's value alone. A later row for the same key
+    wins. An image replaced by the import gives up its store reference.
+    With dry_run nothing is written, but the counts are the same.
+
+    Raises ValueError if the file can't be read as CSV at all. The caller
+    commits (or rolls back) and invalidates the catalog. Returns
+    {'rows', 'inserted', 'updated', 'failed', 'errors': [(line, message)],
+    'ids': updated medicine ids, 'dry_run'}.
+    """
+    report = {'rows': 0, 'inserted': 0, 'updated': 0, 'failed': 0, 'errors': [], 'ids': set(), 'dry_run': dry_run}
+
+    def fail(line, message):
+        report['failed'] += 1
+        if len(report['errors']) < MAX_ERRORS:
+            report['errors'].append((line, message))
+
+    reader = csv.reader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+    try:
+        fields = _header_map(next(reader, []))
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise ValueError(f'Not a readable UTF-8 CSV file ({e})')
+    missing = [field for field in KEY if field not in fields.values()]
+    if missing:
+        fail(1, 'header has no ' + ' or '.join(missing) + ' column')
+        return report
+
+    # Keys created earlier in this import; in a dry run they are not in the
+    # database, but later rows for them still count as updates
+    created = set()
+    chunk = {}
+
+    def flush():
+        existing = _existing(chunk)
+        inserts, updates, replaced = [], [], []
+        for key, (line, values) in chunk.items():
+            if key in existing:
+                updates += [dict(values, id=med_id) for med_id in existing[key]]
+                if 'image' in values:
+                    replaced += [image for image in existing[key].values() if image != values['image']]
+                report['ids'].update(existing[key])
+                report['updated'] += 1
+            elif key in created:
+                report['updated'] += 1
+            elif all(field in values for field in REQUIRED):
+                inserts.append(dict({'discount': 0, 'image': '', 'description': ''}, **values))
+                created.add(key)
+                report['inserted'] += 1
+            else:
+                fail(line, 'new medicine needs ' + ', '.join(field for field in REQUIRED if field not in values))
+        if not dry_run:
+            if inserts:
+                db.session.execute(insert(Medicine), inserts)
+            if updates:
+                db.session.execute(update(Medicine), updates)
+            for image in replaced:
+                release_product_image(image)
+        chunk.clear()
+
+    try:
+        for cells in reader:
+            if not any(cell.strip() for cell in cells):
+                continue
+            report['rows'] += 1
+            try:
+                values = _parse(cells, fields)
+            except ValueError as e:
+                fail(reader.line_num, str(e))
+                continue
+            key = (values['medicine_name'], values['name'])
+            if key in chunk:
+                # Same medicine twice in one chunk: merge, the later row winning
+                values = dict(chunk.pop(key)[1], **values)
+            chunk[key] = (reader.line_num, values)
+            if len(chunk) >= CHUNK_SIZE:
+                flush()
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise ValueError(f'Line {reader.line_num + 1}: not a readable UTF-8 CSV file ({e})')
+    if chunk:
+        flush()
+    report['errors'].sort()
+    return report
@@ -0,0 +1,199 @@
+# services/mail.py
+import os
+import queue
+import smtplib
+import threading
+import time
+from datetime import datetime
+from email.message import EmailMessage
+import config
+
+# Idle connections older than this get a NOOP before they are reused
+HEALTH_CHECK_SECONDS = 15
+# ... and are closed instead once the server has surely dropped them
+MAX_IDLE_SECONDS = 300
+
+# Errors about one message (refused recipient, rejected data); the connection is still good
+MESSAGE_ERRORS = (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused)
+
+
+def build_message(to_email, subject, body):
+    msg = EmailMessage()
+    msg['Subject'] = subject
+    msg['From'] = config.EMAIL_ADDRESS
+    msg['To'] = to_email
+    msg.set_content(body)
+    return msg
+
+
+class SMTPPool:
+    """A bounded pool of logged-in SMTP connections.
+
+    At most size connections exist at once; callers beyond that wait for a
+    free one. Connections are reused across messages, checked with NOOP when
+    they have been idle a while, and re-opened when the server drops them.
+    """
+
+    def __init__(self, host, port, use_ssl=True, use_tls=False, username=None, password=None,
+                 size=2, timeout=30):
+        self.host, self.port = host, port
+        self.use_ssl, self.use_tls = use_ssl, use_tls
+        self.username, self.password = username, password
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle = queue.LifoQueue()
+
+    def _connect(self):
+        smtp_class = smtplib.SMTP_SSL if self.use_ssl else smtplib.SMTP
+        conn = smtp_class(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.use_tls:
+                conn.starttls()
+            conn.ehlo_or_helo_if_needed()
+            # Local stand-in servers usually don't offer AUTH
+            if self.username and conn.has_extn('auth'):
+                conn.login(self.username, self.password)
+        except Exception:
+            conn.close()
+            raise
+        return conn
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.quit()
+        except Exception:
+            conn.close()
+
+    def _checkout(self):
+        while True:
+            try:
+                conn, idle_since = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+            idle = time.monotonic() - idle_since
+            if idle < HEALTH_CHECK_SECONDS:
+                return conn
+            if idle < MAX_IDLE_SECONDS:
+                try:
+                    if conn.noop()[0] == 250:
+                        return conn
+                except (smtplib.SMTPException, OSError):
+                    pass
+            self._close(conn)
+
+    def send_many(self, messages):
+        """Send EmailMessages over one pooled connection.
+
+        Returns one entry per message: None when it was accepted, otherwise
+        the exception. A dropped connection is re-opened once per message;
+        if the server can't be reached or won't log us in, the rest of the
+        batch fails with it.
+        """
+        if not messages:
+            return []
+        results = []
+        self._slots.acquire()
+        conn = None
+        try:
+            for msg in messages:
+                for attempt in range(2):
+                    try:
+                        if conn is None:
+                            conn = self._checkout()
+                        conn.send_message(msg)
+                        results.append(None)
+                        break
+                    except smtplib.SMTPAuthenticationError as e:
+                        # Raised while connecting, so conn is already None;
+                        # retrying with the same credentials won't help
+                        results.append(e)
+                        break
+                    except MESSAGE_ERRORS as e:
+                        results.append(e)
+                        break
+                    except (smtplib.SMTPException, OSError) as e:
+                        if conn is not None:
+                            self._close(conn)
+                            conn = None
+                        if attempt:
+                            results.append(e)
+                if conn is None and results[-1] is not None:
+                    break
+            results += [results[-1]] * (len(messages) - len(results))
+        finally:
+            if conn is not None:
+                self._idle.put((conn, time.monotonic()))
+            self._slots.release()
+        return results
+
+    def close(self):
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._close(conn)
+
+
+class FileSink:
+    """Writes each message to MAIL_SINK_DIR as an .eml file instead of sending it"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._count = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def send_many(self, messages):
+        results = []
+        for msg in messages:
+            with self._lock:
+                self._count += 1
+                name = f"{datetime.utcnow():%Y%m%d-%H%M%S-%f}-{self._count}.eml"
+            try:
+                with open(os.path.join(self.directory, name), 'wb') as f:
+                    f.write(msg.as_bytes())
+                results.append(None)
+            except OSError as e:
+                results.append(e)
+        return results
+
+    def close(self):
+        pass
+
+
+_transport = None
+_transport_lock = threading.Lock()
+
+
+def get_transport():
+    """The process-wide transport picked by MAIL_BACKEND ('smtp' or 'file')"""
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            if config.MAIL_BACKEND == 'file':
+                _transport = FileSink(config.MAIL_SINK_DIR)
+            else:
+                _transport = SMTPPool(
+                    config.MAIL_HOST, config.MAIL_PORT,
+                    use_ssl=config.MAIL_USE_SSL, use_tls=config.MAIL_USE_TLS,
+                    username=config.EMAIL_ADDRESS, password=config.EMAIL_PASSWORD,
+                    size=config.MAIL_POOL_SIZE
+                )
+        return _transport
+
+
+def send_many(messages):
+    """Send (to_email, subject, body) tuples; returns None or the exception for each"""
+    messages = [build_message(*message) for message in messages]
+    if not messages:
+        return []
+    return get_transport().send_many(messages)
+
+
+def send(to_email, subject, body):
+    """Send one message, raising if it wasn't accepted"""
+    error = send_many([(to_email, subject, body)])[0]
+    if error is not None:
+        raise error
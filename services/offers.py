@@ -0,0 +1,71 @@
+# services/offers.py
+import threading
+import time
+from datetime import datetime
+from models import db, Offer
+
+# Upper bound on how long a worker trusts its cached set, so offer edits
+# made through another worker process still show up.
+MAX_CACHE_SECONDS = 300
+
+_lock = threading.Lock()
+_active = None          # list of offer dicts currently on display
+_valid_until = None     # datetime at which the cached set stops being correct
+_cached_at = 0.0
+_offers_version = time.time_ns()
+_expired_at = datetime.min  # when the most recently expired offer ran out
+
+
+def _offer_dict(offer):
+    return {
+        'id': offer.id,
+        'title': offer.title,
+        'description': offer.description,
+        'discount': offer.discount,
+        'valid_until': offer.valid_until,
+    }
+
+
+def active_offers():
+    """Offers that haven't expired yet, oldest first.
+
+    The set is cached until the earliest of: the next offer expiry, an admin
+    edit (invalidate_offers) or MAX_CACHE_SECONDS, so the offer table is only
+    read when the answer can actually have changed.
+    """
+    global _active, _valid_until, _cached_at, _offers_version, _expired_at
+    now = datetime.utcnow()
+    with _lock:
+        if (_active is not None and now < _valid_until
+                and time.monotonic() - _cached_at < MAX_CACHE_SECONDS):
+            return _active
+
+        # Uses the index on Offer.valid_until, so expired offers are never read
+        offers = Offer.query.filter(Offer.valid_until > now).order_by(Offer.id).all()
+        active = [_offer_dict(offer) for offer in offers]
+        # One index probe back from now for the latest expiry, for Last-Modified
+        _expired_at = (db.session.query(Offer.valid_until).filter(Offer.valid_until <= now)
+                       .order_by(Offer.valid_until.desc()).limit(1).scalar()) or datetime.min
+        if _active is not None and active != _active:
+            _offers_version += 1
+        _active = active
+        _valid_until = min((offer['valid_until'] for offer in active), default=datetime.max)
+        _cached_at = time.monotonic()
+        return _active
+
+
+def offers_version():
+    return _offers_version
+
+
+def offers_expired_at():
+    """valid_until of the latest offer to expire; the same in every process"""
+    return _expired_at
+
+
+def invalidate_offers():
+    """Call after committing any change to the offer table"""
+    global _active, _offers_version
+    with _lock:
+        _active = None
+        _offers_version += 1
@@ -0,0 +1,98 @@
+# services/orders.py
+from datetime import datetime
+from sqlalchemy import select, literal, union_all, or_, and_
+from models import db, OrderHeader, OrderLine, Prescription
+
+
+def create_order(user_id, address, prescription, lines):
+    """One header for the checkout plus a line per secured cart line; the caller commits"""
+    order = OrderHeader(
+        user_id=user_id,
+        address=address,
+        prescription=prescription,
+        status='Pending',
+        total=round(sum(line.subtotal for line in lines), 2)
+    )
+    for line in lines:
+        order.lines.append(OrderLine(
+            medicine_id=line.medicine.id,
+            quantity=line.quantity,
+            unit_price=round(line.unit_price, 2),
+            subtotal=line.subtotal
+        ))
+    db.session.add(order)
+    return order
+
+
+def medicine_has_orders(med_id):
+    return db.session.query(OrderLine.id).filter_by(medicine_id=med_id).first() is not None
+
+
+def line_items(order):
+    """Plain dicts for an order's lines, for the admin 'view order' modals"""
+    return [{
+        'name': line.medicine.name if line.medicine else 'N/A',
+        'image': line.medicine.image if line.medicine else '',
+        'quantity': line.quantity,
+        'unit_price': line.unit_price,
+        'subtotal': line.subtotal
+    } for line in order.lines]
+
+
+# Entries per page on the customer's order timeline
+TIMELINE_PAGE_SIZE = 20
+
+
+def encode_timeline_cursor(entry):
+    return f"{entry.ts.isoformat()}|{entry.kind}|{entry.id}"
+
+
+def decode_timeline_cursor(cursor):
+    """Return (ts, kind, id) from a cursor string, or None if it's invalid"""
+    if not cursor:
+        return None
+    try:
+        ts, kind, entry_id = cursor.split('|')
+        return datetime.fromisoformat(ts), kind, int(entry_id)
+    except ValueError:
+        return None
+
+
+def _older_than(ts, entry_id, kind, cursor):
+    # Keyset condition for "comes after the cursor" in (ts, kind, id) DESC order;
+    # kind is a constant within each branch so it is compared here in Python.
+    c_ts, c_kind, c_id = cursor
+    if kind < c_kind:
+        return ts <= c_ts
+    if kind == c_kind:
+        return or_(ts < c_ts, and_(ts == c_ts, entry_id < c_id))
+    return ts < c_ts
+
+
+def timeline_page(user_id, before=None, limit=TIMELINE_PAGE_SIZE):
+    """One page of a customer's orders and prescriptions, newest first.
+
+    A single UNION ALL over order_header and prescription. Each branch is
+    cut to limit + 1 rows through its (user_id, timestamp) index before the
+    merge, so a page never reads more than 2 * (limit + 1) rows no matter
+    how long the history is. Returns (entries, next_cursor); each entry
+    has kind ('order' or 'prescription'), id and ts.
+    """
+    cursor = decode_timeline_cursor(before)
+    branches = []
+    for kind, model, ts_col in (('order', OrderHeader, OrderHeader.ordered_at),
+                                ('prescription', Prescription, Prescription.submitted_at)):
+        branch = (select(literal(kind).label('kind'), model.id.label('id'), ts_col.label('ts'))
+                  .where(model.user_id == user_id, ts_col.isnot(None)))
+        if cursor:
+            branch = branch.where(_older_than(ts_col, model.id, kind, cursor))
+        branch = branch.order_by(ts_col.desc(), model.id.desc()).limit(limit + 1).subquery()
+        branches.append(select(branch))
+    timeline = union_all(*branches).subquery()
+    entries = db.session.execute(
+        select(timeline)
+        .order_by(timeline.c.ts.desc(), timeline.c.kind.desc(), timeline.c.id.desc())
+        .limit(limit + 1)
+    ).all()
+    next_cursor = encode_timeline_cursor(entries[limit - 1]) if len(entries) > limit else None
+    return entries[:limit], next_cursor
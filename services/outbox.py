@@ -0,0 +1,136 @@
+# services/outbox.py
+import random
+import smtplib
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import event, update
+from sqlalchemy.orm import Session
+from models import db, OutboxEmail
+
+WORKERS = 2
+BATCH_SIZE = 20
+# Workers also wake up on every commit that queued mail; this is only the fallback
+POLL_SECONDS = 5
+MAX_ATTEMPTS = 6
+# Retry after 30s, 1m, 2m, 4m, 8m (plus jitter), then give up
+BACKOFF_SECONDS = 30
+# A claimed message goes back to the queue if its worker dies mid-send
+LEASE_SECONDS = 120
+
+_wake = threading.Event()
+_workers = []
+
+
+def queue_email(to_email, subject, body):
+    """Add a message to the outbox in the current transaction; the caller commits.
+
+    Nothing is sent if the transaction rolls back, and nothing is lost if
+    SMTP is down when it commits.
+    """
+    db.session.add(OutboxEmail(to_email=to_email, subject=subject, body=body))
+    db.session.info['outbox_queued'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _wake_after_commit(session):
+    if session.info.pop('outbox_queued', False):
+        _wake.set()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_after_rollback(session):
+    session.info.pop('outbox_queued', None)
+
+
+def backoff_seconds(attempts):
+    return BACKOFF_SECONDS * 2 ** (attempts - 1) * random.uniform(0.8, 1.2)
+
+
+def _claim(limit):
+    """Mark up to limit due messages as ours and return their ids.
+
+    Each claim is a conditional UPDATE, so two workers (or two processes)
+    never pick up the same message.
+    """
+    now = datetime.utcnow()
+    due = (db.session.query(OutboxEmail.id)
+           .filter(OutboxEmail.status.in_(('pending', 'sending')), OutboxEmail.next_attempt_at <= now)
+           .order_by(OutboxEmail.next_attempt_at)
+           .limit(limit).all())
+    claimed = []
+    for (msg_id,) in due:
+        result = db.session.execute(
+            update(OutboxEmail)
+            .where(OutboxEmail.id == msg_id,
+                   OutboxEmail.status.in_(('pending', 'sending')),
+                   OutboxEmail.next_attempt_at <= now)
+            .values(status='sending',
+                    attempts=OutboxEmail.attempts + 1,
+                    next_attempt_at=now + timedelta(seconds=LEASE_SECONDS))
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 1:
+            claimed.append(msg_id)
+    db.session.commit()
+    return claimed
+
+
+def deliver_due(limit=BATCH_SIZE):
+    """Send the messages that are due now as one batch; returns how many were attempted"""
+    from services.mail import send_many
+
+    claimed = _claim(limit)
+    if not claimed:
+        return 0
+    batch = OutboxEmail.query.filter(OutboxEmail.id.in_(claimed)).order_by(OutboxEmail.id).all()
+    results = send_many([(msg.to_email, msg.subject, msg.body) for msg in batch])
+    now = datetime.utcnow()
+    for msg, error in zip(batch, results):
+        if error is None:
+            msg.status = 'sent'
+            msg.sent_at = now
+            msg.last_error = None
+            continue
+        print('Outbox Error:', error)
+        msg.last_error = str(error)
+        if isinstance(error, smtplib.SMTPAuthenticationError):
+            # Our login was refused, not the message: hand it back untried
+            # so a credentials problem doesn't use up its attempts
+            msg.attempts -= 1
+            msg.status = 'pending'
+            msg.next_attempt_at = now + timedelta(seconds=BACKOFF_SECONDS)
+            continue
+        if msg.attempts >= MAX_ATTEMPTS:
+            msg.status = 'failed'
+        else:
+            msg.status = 'pending'
+            msg.next_attempt_at = now + timedelta(seconds=backoff_seconds(msg.attempts))
+    # If we die before this commit the leases run out and the batch is retried
+    db.session.commit()
+    return len(claimed)
+
+
+def _run(app):
+    while True:
+        _wake.wait(POLL_SECONDS)
+        _wake.clear()
+        attempted = BATCH_SIZE
+        # Keep going while there is a full batch waiting
+        while attempted == BATCH_SIZE:
+            with app.app_context():
+                try:
+                    attempted = deliver_due()
+                except Exception as e:
+                    print('Outbox Error:', e)
+                    db.session.rollback()
+                    attempted = 0
+
+
+def start_workers(app):
+    """Start the delivery threads once per process; MAIL_WORKERS = 0 turns them off"""
+    if _workers:
+        return
+    for n in range(app.config.get('MAIL_WORKERS', WORKERS)):
+        worker = threading.Thread(target=_run, args=(app,), name=f'outbox-{n}', daemon=True)
+        worker.start()
+        _workers.append(worker)
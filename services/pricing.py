@@ -0,0 +1,69 @@
+# services/pricing.py
+from dataclasses import dataclass, field
+from models import Medicine
+
+
+def unit_price(price, discount):
+    """Price of one unit after the medicine's percentage discount"""
+    return price * (1 - (discount or 0) / 100)
+
+
+@dataclass
+class QuoteLine:
+    medicine: Medicine
+    quantity: int
+    unit_price: float
+    subtotal: float
+    original_subtotal: float
+
+    @property
+    def summary(self):
+        """One line for order emails"""
+        med = self.medicine
+        return (f"{med.name} x{self.quantity} - ₹{self.subtotal:.2f} "
+                f"(Original: ₹{self.original_subtotal:.2f}, Discount: {med.discount}%)")
+
+
+@dataclass
+class CartQuote:
+    lines: list = field(default_factory=list)
+    total: float = 0.0
+    original_total: float = 0.0
+
+    @property
+    def savings(self):
+        return self.original_total - self.total
+
+    def __bool__(self):
+        return bool(self.lines)
+
+
+def quote_cart(cart):
+    """Price a {medicine id: quantity} cart.
+
+    All medicines are loaded with a single IN query and every line is priced
+    in one pass, so the cost doesn't grow with extra round-trips per line.
+    Unknown medicine ids are dropped.
+    """
+    quantities = {int(med_id): int(qty) for med_id, qty in cart.items() if int(qty) > 0}
+    if not quantities:
+        return CartQuote()
+
+    medicines = Medicine.query.filter(Medicine.id.in_(quantities)).order_by(Medicine.id).all()
+    quote = CartQuote()
+    for med in medicines:
+        qty = quantities[med.id]
+        price = unit_price(med.price, med.discount)
+        line = QuoteLine(
+            medicine=med,
+            quantity=qty,
+            unit_price=round(price, 2),
+            subtotal=round(price * qty, 2),
+            original_subtotal=round(med.price * qty, 2),
+        )
+        quote.lines.append(line)
+        quote.total += line.subtotal
+        quote.original_total += line.original_subtotal
+    quote.total = round(quote.total, 2)
+    quote.original_total = round(quote.original_total, 2)
+    return quote
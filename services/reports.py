@@ -0,0 +1,180 @@
+# services/reports.py
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter, landscape
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.platypus import SimpleDocTemplate, LongTable, TableStyle, Paragraph, Spacer
+from sqlalchemy import or_, update
+import config
+from models import db, Prescription, ReportJob
+from services.admin_tables import filtered_query
+from services.exports import batched_rows
+
+# Workers also wake up whenever a report is requested; this is only the fallback
+POLL_SECONDS = 10
+# A finished report is handed out again for an identical request within this window
+CACHE_SECONDS = 10 * 60
+# Files and job rows are removed this long after they finish
+KEEP_HOURS = 24
+# A running job whose worker died is picked up again after this long
+LEASE_SECONDS = 15 * 60
+
+# Report filters that are kept; anything else in the request is ignored
+FILTERS = ('start', 'end', 'status', 'q')
+
+_wake = threading.Event()
+_workers = []
+
+
+def report_params(args):
+    """The report filters from request args, as canonical JSON so equal requests match"""
+    return json.dumps({name: args[name].strip() for name in FILTERS if (args.get(name) or '').strip()},
+                      sort_keys=True)
+
+
+def request_report(kind, params, user_id):
+    """The job for this report: a recent identical one if there is one, otherwise a new one.
+
+    Commits, and wakes the workers for a new job.
+    """
+    now = datetime.utcnow()
+    recent = (ReportJob.query
+              .filter(ReportJob.kind == kind, ReportJob.params == params,
+                      or_(ReportJob.status.in_(('pending', 'running')),
+                          (ReportJob.status == 'done') & (ReportJob.finished_at >= now - timedelta(seconds=CACHE_SECONDS))))
+              .order_by(ReportJob.id.desc()).first())
+    if recent and (recent.status != 'done' or os.path.exists(report_path(recent))):
+        return recent
+    job = ReportJob(kind=kind, params=params, requested_by=user_id)
+    db.session.add(job)
+    db.session.commit()
+    _wake.set()
+    return job
+
+
+def report_path(job):
+    return os.path.join(config.REPORT_DIR, job.file_path or f'{job.kind}-{job.id}.pdf')
+
+
+def _cell(text, style):
+    return Paragraph(str(text or '').replace('&', '&amp;').replace('<', '&lt;'), style)
+
+
+def build_prescriptions_pdf(path, params):
+    """Write the prescriptions report to path; returns how many rows it has.
+
+    Rows are read in keyset batches with the patient and doctor joined in, and
+    laid out in a LongTable that repeats its header on every page.
+    """
+    styles = getSampleStyleSheet()
+    cell = styles['BodyText'].clone('cell', fontSize=8, leading=10)
+    query = filtered_query('prescriptions', params)
+    data = [['ID', 'Patient', 'Doctor', 'Medicine', 'Dosage', 'Status', 'Date']]
+    data += batched_rows(query, Prescription.id, lambda p: p.id, lambda p: [
+        str(p.id),
+        _cell(p.user.email if p.user else '', cell),
+        _cell(p.doctor.email if p.doctor else 'N/A', cell),
+        _cell(p.medicine, cell),
+        _cell(p.dosage, cell),
+        _cell(p.status, cell),
+        p.submitted_at.strftime('%Y-%m-%d') if p.submitted_at else '',
+    ])
+
+    filters = ', '.join(f'{name}: {value}' for name, value in params.items()) or 'all prescriptions'
+    table = LongTable(data, repeatRows=1, colWidths=[40, 150, 150, 150, 90, 90, 70])
+    table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 8),
+        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.beige]),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+    ]))
+    doc = SimpleDocTemplate(path, pagesize=landscape(letter), title='Prescriptions Report')
+    doc.build([
+        Paragraph('Prescriptions Report', styles['Title']),
+        Paragraph(f'{filters} · {len(data) - 1} row(s) · generated {datetime.utcnow():%Y-%m-%d %H:%M} UTC', styles['Normal']),
+        Spacer(1, 12),
+        table,
+    ])
+    return len(data) - 1
+
+
+BUILDERS = {'prescriptions_pdf': build_prescriptions_pdf}
+
+
+def _claim():
+    """Mark the oldest waiting job as ours; conditional UPDATE so only one worker gets it"""
+    now = datetime.utcnow()
+    waiting = or_(ReportJob.status == 'pending',
+                  (ReportJob.status == 'running') & (ReportJob.started_at < now - timedelta(seconds=LEASE_SECONDS)))
+    job_id = db.session.query(ReportJob.id).filter(waiting).order_by(ReportJob.created_at).limit(1).scalar()
+    if job_id is None:
+        return None
+    result = db.session.execute(
+        update(ReportJob)
+        .where(ReportJob.id == job_id, waiting)
+        .values(status='running', started_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return job_id if result.rowcount == 1 else None
+
+
+def run_job(job_id):
+    job = db.session.get(ReportJob, job_id)
+    os.makedirs(config.REPORT_DIR, exist_ok=True)
+    job.file_path = f'{job.kind}-{job.id}.pdf'
+    path, kind, params = report_path(job), job.kind, json.loads(job.params)
+    db.session.commit()
+    try:
+        # Built under a temporary name so a half-written file is never served
+        rows = BUILDERS[kind](path + '.part', params)
+        os.replace(path + '.part', path)
+    except Exception as e:
+        print('Report Error:', e)
+        db.session.rollback()
+        job = db.session.get(ReportJob, job_id)
+        job.status, job.error = 'failed', str(e)
+    else:
+        job = db.session.get(ReportJob, job_id)
+        job.status, job.rows = 'done', rows
+    job.finished_at = datetime.utcnow()
+    db.session.commit()
+
+
+def remove_old_reports():
+    cutoff = datetime.utcnow() - timedelta(hours=KEEP_HOURS)
+    for job in ReportJob.query.filter(ReportJob.status.in_(('done', 'failed')), ReportJob.finished_at < cutoff):
+        if job.file_path and os.path.exists(report_path(job)):
+            os.remove(report_path(job))
+        db.session.delete(job)
+    db.session.commit()
+
+
+def _run(app):
+    while True:
+        _wake.wait(POLL_SECONDS)
+        _wake.clear()
+        with app.app_context():
+            try:
+                while (job_id := _claim()) is not None:
+                    run_job(job_id)
+                remove_old_reports()
+            except Exception as e:
+                print('Report Error:', e)
+                db.session.rollback()
+
+
+def start_report_workers(app):
+    """Start the report threads once per process; REPORT_WORKERS = 0 turns them off"""
+    if _workers:
+        return
+    for n in range(app.config.get('REPORT_WORKERS', 1)):
+        worker = threading.Thread(target=_run, args=(app,), name=f'reports-{n}', daemon=True)
+        worker.start()
+        _workers.append(worker)
@@ -0,0 +1,196 @@
+# services/rollups.py
+from collections import defaultdict
+from datetime import datetime
+from sqlalchemy import event, func, inspect, select, update, delete, insert
+from sqlalchemy.dialects import sqlite, postgresql
+from sqlalchemy.orm import Session
+from models import db, DailyMedicineSales, DailyStatusSales, Medicine, OrderHeader, OrderLine
+
+_UPSERT_INSERTS = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}
+
+# Rollup key for orders saved without a status
+NO_STATUS = 'Unknown'
+# Breakdowns by medicine are cut to the best sellers
+MAX_MEDICINES = 100
+GROUPS = ('day', 'status', 'medicine', 'category')
+
+
+def _day(order):
+    return (order.ordered_at or datetime.utcnow()).date()
+
+
+def _status(status):
+    return status or NO_STATUS
+
+
+@event.listens_for(OrderHeader.status, 'set', active_history=True)
+def _load_old_status(order, value, old_value, initiator):
+    # Nothing to do here: active_history makes the old status available to the
+    # flush below even when it was never loaded before being overwritten
+    pass
+
+
+def _line_sums(session, order_id):
+    return session.execute(
+        select(OrderLine.medicine_id, func.sum(OrderLine.quantity), func.sum(OrderLine.subtotal))
+        .where(OrderLine.order_id == order_id)
+        .group_by(OrderLine.medicine_id)
+    ).all()
+
+
+def _collect(session):
+    """What this flush did to orders, as deltas per rollup row"""
+    by_status = defaultdict(lambda: [0, 0.0])
+    by_medicine = defaultdict(lambda: [0, 0.0])
+
+    def add_order(order, status, sign):
+        row = by_status[(_day(order), status)]
+        row[0] += sign
+        row[1] += sign * (order.total or 0)
+
+    def add_lines(order, status, lines, sign):
+        for medicine_id, units, revenue in lines:
+            row = by_medicine[(_day(order), status, medicine_id)]
+            row[0] += sign * (units or 0)
+            row[1] += sign * (revenue or 0)
+
+    for obj in session.new:
+        if isinstance(obj, OrderHeader):
+            add_order(obj, _status(obj.status), 1)
+        elif isinstance(obj, OrderLine) and obj.order is not None:
+            add_lines(obj.order, _status(obj.order.status), [(obj.medicine_id, obj.quantity, obj.subtotal)], 1)
+
+    for obj in session.dirty:
+        if not isinstance(obj, OrderHeader) or obj in session.new:
+            continue
+        history = inspect(obj).attrs.status.history
+        if not history.deleted:
+            continue
+        old, new = _status(history.deleted[0]), _status(obj.status)
+        if old == new:
+            continue
+        add_order(obj, old, -1)
+        add_order(obj, new, 1)
+        lines = _line_sums(session, obj.id)
+        add_lines(obj, old, lines, -1)
+        add_lines(obj, new, lines, 1)
+
+    for obj in session.deleted:
+        if isinstance(obj, OrderHeader):
+            add_order(obj, _status(obj.status), -1)
+        elif isinstance(obj, OrderLine) and obj.order is not None:
+            add_lines(obj.order, _status(obj.order.status), [(obj.medicine_id, obj.quantity, obj.subtotal)], -1)
+
+    return by_status, by_medicine
+
+
+def _apply(connection, model, keys, counter, deltas):
+    """Add each (count, revenue) delta to its rollup row, creating the row if needed"""
+    upsert = _UPSERT_INSERTS.get(connection.dialect.name)
+    for key, (count, revenue) in deltas.items():
+        if not count and not revenue:
+            continue
+        values = dict(zip(keys, key), **{counter: count, 'revenue': revenue})
+        if upsert is not None:
+            stmt = upsert(model).values(**values)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[getattr(model, name) for name in keys],
+                set_={counter: getattr(model, counter) + getattr(stmt.excluded, counter),
+                      'revenue': model.revenue + stmt.excluded.revenue}
+            )
+            connection.execute(stmt)
+            continue
+        result = connection.execute(
+            update(model)
+            .where(*[getattr(model, name) == value for name, value in zip(keys, key)])
+            .values(**{counter: getattr(model, counter) + count, 'revenue': model.revenue + revenue})
+        )
+        if result.rowcount == 0:
+            connection.execute(insert(model).values(**values))
+
+
+@event.listens_for(Session, 'after_flush')
+def _update_rollups(session, flush_context):
+    # Same transaction as the order writes, so the rollups can't drift from them
+    if not any(isinstance(obj, (OrderHeader, OrderLine)) for obj in (*session.new, *session.dirty, *session.deleted)):
+        return
+    by_status, by_medicine = _collect(session)
+    connection = session.connection()
+    _apply(connection, DailyStatusSales, ('day', 'status'), 'orders', by_status)
+    _apply(connection, DailyMedicineSales, ('day', 'status', 'medicine_id'), 'units', by_medicine)
+
+
+def rebuild_rollups():
+    """Recompute both rollup tables from the orders; the caller commits"""
+    day = func.coalesce(func.date(OrderHeader.ordered_at), func.date('now'))
+    status = func.coalesce(OrderHeader.status, NO_STATUS)
+    db.session.execute(delete(DailyStatusSales))
+    db.session.execute(delete(DailyMedicineSales))
+    db.session.execute(insert(DailyStatusSales).from_select(
+        ['day', 'status', 'orders', 'revenue'],
+        select(day, status, func.count(OrderHeader.id), func.coalesce(func.sum(OrderHeader.total), 0))
+        .group_by(day, status)
+    ))
+    db.session.execute(insert(DailyMedicineSales).from_select(
+        ['day', 'status', 'medicine_id', 'units', 'revenue'],
+        select(day, status, OrderLine.medicine_id, func.sum(OrderLine.quantity), func.sum(OrderLine.subtotal))
+        .join(OrderHeader, OrderHeader.id == OrderLine.order_id)
+        .group_by(day, status, OrderLine.medicine_id)
+    ))
+
+
+def sales_report(start=None, end=None, statuses=None, group='day'):
+    """Orders, units and revenue between two dates (inclusive), from the rollups only.
+
+    group picks the breakdown: 'day', 'status', 'medicine' (best sellers
+    first) or 'category'; groups whose counts went back to zero after a
+    status change are left out. Returns {'totals': {...}, 'rows': [...]}.
+    """
+    def window(model, query):
+        if start:
+            query = query.filter(model.day >= start)
+        if end:
+            query = query.filter(model.day <= end)
+        if statuses:
+            query = query.filter(model.status.in_(statuses))
+        return query
+
+    orders_q = window(DailyStatusSales, db.session.query(
+        func.coalesce(func.sum(DailyStatusSales.orders), 0), func.coalesce(func.sum(DailyStatusSales.revenue), 0)))
+    units_q = window(DailyMedicineSales, db.session.query(func.coalesce(func.sum(DailyMedicineSales.units), 0)))
+    orders, revenue = orders_q.one()
+    totals = {'orders': orders, 'units': units_q.scalar(), 'revenue': round(revenue, 2)}
+
+    if group == 'status':
+        rows = [{'status': status, 'orders': count, 'revenue': round(total or 0, 2)}
+                for status, count, total in window(DailyStatusSales, db.session.query(
+                    DailyStatusSales.status, func.sum(DailyStatusSales.orders), func.sum(DailyStatusSales.revenue)))
+                .group_by(DailyStatusSales.status)
+                .having(func.sum(DailyStatusSales.orders) != 0).order_by(DailyStatusSales.status)]
+    elif group == 'medicine':
+        units, total = func.sum(DailyMedicineSales.units), func.sum(DailyMedicineSales.revenue)
+        rows = [{'medicine_id': medicine_id, 'name': name, 'units': count, 'revenue': round(amount or 0, 2)}
+                for medicine_id, name, count, amount in window(DailyMedicineSales, db.session.query(
+                    DailyMedicineSales.medicine_id, Medicine.name, units, total))
+                .outerjoin(Medicine, Medicine.id == DailyMedicineSales.medicine_id)
+                .group_by(DailyMedicineSales.medicine_id, Medicine.name)
+                .having(units != 0).order_by(total.desc()).limit(MAX_MEDICINES)]
+    elif group == 'category':
+        rows = [{'category': category, 'units': count, 'revenue': round(amount or 0, 2)}
+                for category, count, amount in window(DailyMedicineSales, db.session.query(
+                    Medicine.category, func.sum(DailyMedicineSales.units), func.sum(DailyMedicineSales.revenue)))
+                .outerjoin(Medicine, Medicine.id == DailyMedicineSales.medicine_id)
+                .group_by(Medicine.category).having(func.sum(DailyMedicineSales.units) != 0)
+                .order_by(func.sum(DailyMedicineSales.revenue).desc())]
+    else:
+        per_day = {day: {'day': day.isoformat(), 'orders': count, 'units': 0, 'revenue': round(amount or 0, 2)}
+                   for day, count, amount in window(DailyStatusSales, db.session.query(
+                       DailyStatusSales.day, func.sum(DailyStatusSales.orders), func.sum(DailyStatusSales.revenue)))
+                   .group_by(DailyStatusSales.day).having(func.sum(DailyStatusSales.orders) != 0)}
+        for day, count in window(DailyMedicineSales, db.session.query(
+                DailyMedicineSales.day, func.sum(DailyMedicineSales.units))).group_by(DailyMedicineSales.day) \
+                .having(func.sum(DailyMedicineSales.units) != 0):
+            per_day.setdefault(day, {'day': day.isoformat(), 'orders': 0, 'units': 0, 'revenue': 0})['units'] = count
+        rows = [per_day[day] for day in sorted(per_day)]
+
+    return {'totals': totals, 'rows': rows}
@@ -0,0 +1,134 @@
+# services/search.py
+import re
+from sqlalchemy import text, table, column
+from sqlalchemy.exc import OperationalError
+from models import db, Medicine
+
+FTS_TABLE = 'medicine_fts'
+
+# Column order matters for bm25() weights: brand and generic names rank
+# above category, which ranks above free-text description.
+FTS_COLUMNS = ('name', 'medicine_name', 'category', 'description')
+RANK_WEIGHTS = (10.0, 10.0, 4.0, 1.0)
+
+medicine_fts = table(FTS_TABLE, column('rowid'), column('rank'))
+
+_CREATE_TABLE = f'''
+CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+    {', '.join(FTS_COLUMNS)},
+    content='medicine',
+    content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2',
+    prefix='2 3'
+)
+'''
+
+_NEW_VALUES = ', '.join(f'new.{c}' for c in FTS_COLUMNS)
+_OLD_VALUES = ', '.join(f'old.{c}' for c in FTS_COLUMNS)
+_COLUMNS = ', '.join(FTS_COLUMNS)
+
+# Keep the index in sync with every write to the medicine table, whichever
+# route (or script) makes it. Stock/price updates don't touch indexed
+# columns, so the update trigger is limited to the columns we search.
+_TRIGGERS = [
+    f'''
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON medicine BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, {_COLUMNS}) VALUES (new.id, {_NEW_VALUES});
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON medicine BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_COLUMNS}) VALUES ('delete', old.id, {_OLD_VALUES});
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF {_COLUMNS} ON medicine BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_COLUMNS}) VALUES ('delete', old.id, {_OLD_VALUES});
+        INSERT INTO {FTS_TABLE}(rowid, {_COLUMNS}) VALUES (new.id, {_NEW_VALUES});
+    END
+    ''',
+]
+
+# None = not checked yet for this process, True/False once we know
+_fts_ready = None
+
+
+def ensure_search_index():
+    """Create the FTS5 index and its sync triggers if they don't exist yet.
+
+    Returns True when full-text search is usable, False when the database
+    isn't SQLite or was built without FTS5 (callers fall back to LIKE).
+    """
+    global _fts_ready
+    if _fts_ready is not None:
+        return _fts_ready
+
+    if db.engine.dialect.name != 'sqlite':
+        _fts_ready = False
+        return _fts_ready
+
+    try:
+        with db.engine.begin() as conn:
+            exists = conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                {'name': FTS_TABLE}
+            ).first()
+            if not exists:
+                conn.execute(text(_CREATE_TABLE))
+                weights = ', '.join(str(w) for w in RANK_WEIGHTS)
+                conn.execute(text(
+                    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rank) VALUES ('rank', 'bm25({weights})')"
+                ))
+                # Index whatever is already in the catalog
+                conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+            for trigger in _TRIGGERS:
+                conn.execute(text(trigger))
+        _fts_ready = True
+    except OperationalError as e:
+        print('Search Index Error:', e)
+        _fts_ready = False
+    return _fts_ready
+
+
+def rebuild_search_index():
+    """Re-index the whole catalog, e.g. after rows were changed with triggers missing"""
+    if ensure_search_index():
+        with db.engine.begin() as conn:
+            conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+
+
+def build_match_query(search_query):
+    """Turn free text into an FTS5 MATCH expression.
+
+    Every word becomes a quoted prefix term, so 'para 50' matches
+    'Paracetamol 500' and user input can never inject FTS5 syntax.
+    """
+    terms = re.findall(r'\w+', search_query.lower())
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def apply_search(query, search_query):
+    """Restrict a Medicine query to rows matching search_query.
+
+    Returns (query, ranked). When ranked is True the query is joined to the
+    FTS index and ordered by relevance (best first), with Medicine.id as a
+    tie-breaker so the ordering is stable.
+    """
+    match = build_match_query(search_query)
+    if match and ensure_search_index():
+        query = query.join(medicine_fts, medicine_fts.c.rowid == Medicine.id) \
+            .filter(text(f'{FTS_TABLE} MATCH :match').bindparams(match=match)) \
+            .order_by(medicine_fts.c.rank, Medicine.id)
+        return query, True
+
+    query = query.filter(
+        (Medicine.name.ilike(f'%{search_query}%')) |
+        (Medicine.medicine_name.ilike(f'%{search_query}%'))
+    )
+    return query, False
+
+
+def search_ids(search_query):
+    """Ids of every medicine matching search_query, unordered"""
+    query, _ = apply_search(Medicine.query, search_query)
+    return [med_id for (med_id,) in query.order_by(None).with_entities(Medicine.id)]
@@ -0,0 +1,65 @@
+# services/stats.py
+from sqlalchemy import func, select
+from models import db, DailyStatusSales, Medicine, Prescription, User
+from services.cache import TTLCache
+from services.catalog import on_catalog_change
+
+# Dashboard numbers may be this stale; admin order edits clear them straight away
+STATS_TTL = 30
+# Shown (with zeros) when there are no orders yet, and listed first otherwise
+DEFAULT_STATUSES = ['Pending', 'Processing', 'Shipped', 'Delivered']
+
+_stats_cache = TTLCache(maxsize=1, ttl=STATS_TTL)
+
+
+def _entity_totals():
+    """Medicine, customer and prescription counts in one round-trip"""
+    row = db.session.execute(select(
+        select(func.count(Medicine.id)).scalar_subquery(),
+        select(func.count(User.id)).where(User.is_admin.is_(False)).scalar_subquery(),
+        select(func.count(Prescription.id)).scalar_subquery(),
+    )).one()
+    return dict(zip(('total_meds', 'total_users', 'total_prescriptions'), row))
+
+
+def _status_breakdown():
+    """Order count and sales per status from a single GROUP BY over the daily rollups"""
+    rows = (db.session.query(DailyStatusSales.status, func.sum(DailyStatusSales.orders), func.sum(DailyStatusSales.revenue))
+            .group_by(DailyStatusSales.status).all())
+    by_status = {status: (count, round(sales or 0, 2)) for status, count, sales in rows if count}
+    if by_status:
+        labels = [status for status in DEFAULT_STATUSES if status in by_status]
+        labels += sorted(status for status in by_status if status not in DEFAULT_STATUSES)
+    else:
+        labels = list(DEFAULT_STATUSES)
+    return {
+        'status_labels': labels,
+        'order_counts': [by_status.get(status, (0, 0))[0] for status in labels],
+        'sales_data': [by_status.get(status, (0, 0))[1] for status in labels],
+    }
+
+
+def _compute():
+    stats = _entity_totals()
+    stats.update(_status_breakdown())
+    stats['total_orders'] = sum(stats['order_counts'])
+    counts = dict(zip(stats['status_labels'], stats['order_counts']))
+    sales = dict(zip(stats['status_labels'], stats['sales_data']))
+    for status in DEFAULT_STATUSES:
+        stats[f'{status.lower()}_orders'] = counts.get(status, 0)
+        stats[f'{status.lower()}_sales'] = sales.get(status, 0)
+    return stats
+
+
+def dashboard_stats():
+    """Counts and per-status totals for the admin dashboard, as template variables.
+
+    Two queries when the cache is cold, none while it is warm.
+    """
+    return _stats_cache.get_or_set('dashboard', _compute)
+
+
+@on_catalog_change
+def invalidate_stats(med_ids=None):
+    """Call after committing a change to orders; medicine changes clear it on their own"""
+    _stats_cache.clear()
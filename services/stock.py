@@ -0,0 +1,164 @@
+# services/stock.py
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import update, delete
+from models import db, Medicine, StockReservation
+from services.catalog import invalidate_catalog
+
+# How long stock set aside on the checkout page stays held for the buyer
+RESERVATION_MINUTES = 15
+# How often the sweeper thread gives back the stock of expired holds
+SWEEP_SECONDS = 60
+
+_worker = []
+
+
+def try_decrement(med_id, quantity):
+    """Take quantity units of stock, only if that many are left.
+
+    A single conditional UPDATE, so two buyers can never both pass the
+    check and oversell. Returns True when the stock was taken; runs in the
+    caller's transaction.
+    """
+    result = db.session.execute(
+        update(Medicine)
+        .where(Medicine.id == med_id, Medicine.stock >= quantity)
+        .values(stock=Medicine.stock - quantity)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+def restock(med_id, quantity):
+    db.session.execute(
+        update(Medicine)
+        .where(Medicine.id == med_id)
+        .values(stock=Medicine.stock + quantity)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _release(reservation_id, med_id, quantity):
+    # Whoever deletes the row puts the stock back, so concurrent sweeps
+    # can't release the same reservation twice.
+    result = db.session.execute(
+        delete(StockReservation).where(StockReservation.id == reservation_id)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 1:
+        restock(med_id, quantity)
+        return True
+    return False
+
+
+def release_expired_reservations():
+    """Return stock held by reservations that ran out; the caller commits.
+
+    Returns the medicine ids touched.
+    """
+    expired = db.session.query(StockReservation.id, StockReservation.medicine_id, StockReservation.quantity) \
+        .filter(StockReservation.expires_at <= datetime.utcnow()).all()
+    return {med_id for res_id, med_id, qty in expired if _release(res_id, med_id, qty)}
+
+
+def sweep_expired_reservations():
+    """Release expired holds and commit, so stock doesn't stay held on a quiet site"""
+    released = release_expired_reservations()
+    db.session.commit()
+    if released:
+        invalidate_catalog(released)
+
+
+def _run(app):
+    while True:
+        time.sleep(SWEEP_SECONDS)
+        with app.app_context():
+            try:
+                sweep_expired_reservations()
+            except Exception as e:
+                print('Stock Error:', e)
+                db.session.rollback()
+
+
+def start_reservation_sweeper(app):
+    """One sweeper thread per process"""
+    if _worker:
+        return
+    worker = threading.Thread(target=_run, args=(app,), name='reservation-sweeper', daemon=True)
+    worker.start()
+    _worker.append(worker)
+
+
+def release_user_reservations(user_id):
+    """Give back everything the user is holding; the caller commits"""
+    held = db.session.query(StockReservation.id, StockReservation.medicine_id, StockReservation.quantity) \
+        .filter(StockReservation.user_id == user_id).all()
+    return {med_id for res_id, med_id, qty in held if _release(res_id, med_id, qty)}
+
+
+def orderable_lines(user_id, lines):
+    """The lines an order placed now could get stock for.
+
+    A line is orderable when the user holds a live reservation of its size,
+    or when the stock left (plus any hold of another size, which checkout
+    gives back) covers it; those go through secure_lines' conditional
+    decrement. Runs no writes.
+    """
+    held = dict(db.session.query(StockReservation.medicine_id, StockReservation.quantity)
+                .filter(StockReservation.user_id == user_id, StockReservation.expires_at > datetime.utcnow()))
+    return [line for line in lines
+            if held.get(line.medicine.id) == line.quantity
+            or (line.medicine.stock or 0) + held.get(line.medicine.id, 0) >= line.quantity]
+
+
+def reserve_lines(user_id, lines):
+    """Hold stock for the user's cart lines while they fill in checkout.
+
+    Any earlier hold by the same user is released first. Returns the ids of
+    the medicines now reserved; the caller commits.
+    """
+    release_user_reservations(user_id)
+    expires_at = datetime.utcnow() + timedelta(minutes=RESERVATION_MINUTES)
+    reserved = set()
+    for line in lines:
+        med_id = line.medicine.id
+        if try_decrement(med_id, line.quantity):
+            db.session.add(StockReservation(user_id=user_id, medicine_id=med_id,
+                                            quantity=line.quantity, expires_at=expires_at))
+            reserved.add(med_id)
+    return reserved
+
+
+def secure_lines(user_id, lines):
+    """Take stock for the lines being ordered.
+
+    Lines covered by a live reservation of the right size use it (the stock
+    was already taken); anything else, or a changed quantity, goes through a
+    fresh conditional decrement. Returns the lines that got their stock.
+    The caller commits, together with the orders.
+    """
+    now = datetime.utcnow()
+    held = {
+        res.medicine_id: res
+        for res in StockReservation.query.filter(StockReservation.user_id == user_id)
+    }
+    secured = []
+    for line in lines:
+        med_id = line.medicine.id
+        res = held.pop(med_id, None)
+        if res is not None and res.quantity == line.quantity and res.expires_at > now:
+            if db.session.execute(
+                delete(StockReservation).where(StockReservation.id == res.id)
+                .execution_options(synchronize_session=False)
+            ).rowcount == 1:
+                secured.append(line)
+                continue
+        elif res is not None:
+            _release(res.id, med_id, res.quantity)
+        if try_decrement(med_id, line.quantity):
+            secured.append(line)
+    # Holds for medicines no longer in the cart
+    for res in held.values():
+        _release(res.id, res.medicine_id, res.quantity)
+    return secured
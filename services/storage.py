@@ -0,0 +1,141 @@
+# services/storage.py
+import hashlib
+import os
+import tempfile
+from sqlalchemy import delete, event, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from werkzeug.utils import secure_filename
+from models import db, StoredFile
+
+UPLOAD_DIR = 'static/uploads'
+# Uploads are written here while they are hashed; outside the public static
+# tree, but on the same filesystem so the final move is an atomic rename
+STAGING_DIR = 'instance/upload_staging'
+CHUNK_SIZE = 64 * 1024
+
+
+def shard_path(digest, ext):
+    """ab/cd/abcd...<ext>: two levels of 256 directories keep each one small"""
+    return f'{digest[:2]}/{digest[2:4]}/{digest}{ext}'
+
+
+def store_upload(file):
+    """Store an uploaded file once per distinct content and take a reference on it.
+
+    The upload is hashed while it streams to a temporary file, then moved
+    to its digest path unless an identical file is already stored. Returns
+    the path relative to UPLOAD_DIR; the reference count change is added
+    to the current session, so it commits with the caller's transaction.
+    """
+    ext = os.path.splitext(secure_filename(file.filename or ''))[1].lower()
+    os.makedirs(STAGING_DIR, exist_ok=True)
+
+    hasher = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=STAGING_DIR)
+    try:
+        with os.fdopen(fd, 'wb') as tmp:
+            while True:
+                chunk = file.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                hasher.update(chunk)
+                tmp.write(chunk)
+                size += len(chunk)
+        digest = hasher.hexdigest()
+
+        path, created = _take_reference(digest, shard_path(digest, ext), size)
+        target = full_path(path)
+        # A new record always (re)places the file, in case the last release
+        # of the same content is still deleting it
+        if created or not os.path.exists(target):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(tmp_path, target)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return path
+
+
+def _take_reference(digest, path, size):
+    """Add one reference to the record for digest, creating it if needed.
+
+    The count is changed with a single UPDATE so concurrent uploads don't
+    lose increments. Returns (stored path, whether the record is new).
+    """
+    for _ in range(2):
+        stored = db.session.execute(
+            update(StoredFile).where(StoredFile.digest == digest)
+            .values(ref_count=StoredFile.ref_count + 1)
+            .returning(StoredFile.path)
+        ).scalar()
+        if stored is not None:
+            return stored, False
+        try:
+            # Savepoint, so losing the race to another first upload of the
+            # same content doesn't roll back the caller's transaction
+            with db.session.begin_nested():
+                db.session.add(StoredFile(digest=digest, path=path, size=size, ref_count=1))
+            return path, True
+        except IntegrityError:
+            continue  # the other upload's row exists now; reference that one
+    raise RuntimeError(f'Could not store file {digest}')
+
+
+def full_path(path):
+    return os.path.join(UPLOAD_DIR, path)
+
+
+def release(path):
+    """Drop one reference to a stored file, deleting it with the last one.
+
+    Paths that were never stored through store_upload (legacy uploads) are
+    left alone. Like store_upload, the caller commits; the files themselves
+    are only removed once that commit succeeds.
+    """
+    record_id = db.session.execute(
+        update(StoredFile).where(StoredFile.path == path)
+        .values(ref_count=StoredFile.ref_count - 1)
+        .returning(StoredFile.id)
+    ).scalar()
+    if record_id is None:
+        return
+    gone = db.session.execute(
+        delete(StoredFile).where(StoredFile.id == record_id, StoredFile.ref_count <= 0)
+    ).rowcount
+    if gone:
+        db.session.info.setdefault('released_files', set()).add(path)
+
+
+def _remove_files(path):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    directory = os.path.dirname(full_path(path))
+    # The original plus any derivatives generated beside it
+    if os.path.isdir(directory):
+        for name in os.listdir(directory):
+            if name.startswith(stem):
+                os.remove(os.path.join(directory, name))
+
+
+@event.listens_for(Session, 'after_commit')
+def _remove_after_commit(session):
+    paths = session.info.pop('released_files', None)
+    if not paths:
+        return
+    # A new upload of the same content may have recorded it again since
+    with db.engine.connect() as connection:
+        live = set(connection.execute(select(StoredFile.path).where(StoredFile.path.in_(paths))).scalars())
+    for path in paths - live:
+        try:
+            _remove_files(path)
+        except OSError as e:
+            print('Storage Error:', e)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _keep_after_rollback(session, previous_transaction):
+    # Only the outermost rollback; a savepoint lost in _take_reference
+    # doesn't undo releases made earlier in the transaction
+    if previous_transaction.parent is None:
+        session.info.pop('released_files', None)
@@ -0,0 +1,160 @@
+# services/suggest.py
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+from models import Medicine
+from services.catalog import on_catalog_change
+
+MAX_SUGGESTIONS = 20
+
+# Full rebuild at least this often, to pick up catalog writes made by other
+# worker processes (this process's own writes are applied immediately).
+REBUILD_SECONDS = 300
+
+
+class PrefixIndex:
+    """Sorted array of (key, medicine id) pairs searched with bisect.
+
+    Each brand and generic name is indexed in full and from every word
+    boundary, so 'dolo', 'dolo 6' and '650' all find 'Dolo 650'.
+    """
+
+    def __init__(self):
+        self._entries = []   # sorted [(key, med_id)]
+        self._keys = {}      # med_id -> keys it was indexed under
+        self._labels = {}    # med_id -> (name, medicine_name)
+
+    @staticmethod
+    def keys_for(*names):
+        keys = set()
+        for name in names:
+            words = re.findall(r'\w+', (name or '').lower())
+            for i in range(len(words)):
+                keys.add(' '.join(words[i:]))
+        return keys
+
+    def add(self, med_id, name, medicine_name):
+        self.remove(med_id)
+        keys = self.keys_for(name, medicine_name)
+        for key in keys:
+            insort(self._entries, (key, med_id))
+        self._keys[med_id] = keys
+        self._labels[med_id] = (name, medicine_name)
+
+    @classmethod
+    def build(cls, rows):
+        """An index of (med_id, name, medicine_name) rows, sorted once at the end"""
+        index = cls()
+        for med_id, name, medicine_name in rows:
+            keys = cls.keys_for(name, medicine_name)
+            index._entries.extend((key, med_id) for key in keys)
+            index._keys[med_id] = keys
+            index._labels[med_id] = (name, medicine_name)
+        index._entries.sort()
+        return index
+
+    def remove(self, med_id):
+        for key in self._keys.pop(med_id, ()):
+            i = bisect_left(self._entries, (key, med_id))
+            if i < len(self._entries) and self._entries[i] == (key, med_id):
+                del self._entries[i]
+        self._labels.pop(med_id, None)
+
+    def search(self, prefix, limit=10):
+        prefix = ' '.join(re.findall(r'\w+', prefix.lower()))
+        if not prefix:
+            return []
+        results = []
+        seen = set()
+        i = bisect_left(self._entries, (prefix,))
+        while i < len(self._entries) and len(results) < limit:
+            key, med_id = self._entries[i]
+            if not key.startswith(prefix):
+                break
+            if med_id not in seen:
+                seen.add(med_id)
+                name, medicine_name = self._labels[med_id]
+                results.append({'id': med_id, 'name': name, 'medicine_name': medicine_name})
+            i += 1
+        return results
+
+    def __len__(self):
+        return len(self._labels)
+
+
+_lock = threading.Lock()
+# Held by whichever request is rebuilding; the others keep using the old index
+_build_lock = threading.Lock()
+_index = None
+_built_at = 0.0
+_dirty = set()
+_generation = 0  # bumped by full invalidations, so a build that overlaps one is redone
+
+
+def _rows(query):
+    return query.with_entities(Medicine.id, Medicine.name, Medicine.medicine_name)
+
+
+def _build():
+    return PrefixIndex.build(_rows(Medicine.query).yield_per(1000))
+
+
+def _rebuild(wait):
+    """Build a fresh index outside _lock and swap it in.
+
+    With wait=False this gives up at once if another request is already
+    rebuilding. Rows touched while the build runs stay in _dirty and are
+    applied to the new index on the next lookup.
+    """
+    global _index, _built_at
+    if not _build_lock.acquire(blocking=wait):
+        return
+    try:
+        with _lock:
+            if _index is not None and time.monotonic() - _built_at <= REBUILD_SECONDS:
+                return  # someone else rebuilt it while we waited
+            _dirty.clear()
+            generation = _generation
+        index = _build()
+        with _lock:
+            _index = index
+            _built_at = time.monotonic() if generation == _generation else 0.0
+    finally:
+        _build_lock.release()
+
+
+def suggest(prefix, limit=10):
+    """Typeahead matches for prefix, answered from memory"""
+    limit = max(1, min(limit, MAX_SUGGESTIONS))
+    with _lock:
+        missing = _index is None
+        stale = not missing and time.monotonic() - _built_at > REBUILD_SECONDS
+    if missing or stale:
+        # Only the very first lookup (or one after a full invalidation) waits
+        _rebuild(wait=missing)
+    with _lock:
+        if _index is None:
+            return []
+        if _dirty and not _build_lock.locked():
+            # Re-read only the rows admins touched since the last lookup
+            ids = list(_dirty)
+            _dirty.clear()
+            found = set()
+            for med_id, name, medicine_name in _rows(Medicine.query.filter(Medicine.id.in_(ids))):
+                _index.add(med_id, name, medicine_name)
+                found.add(med_id)
+            for med_id in set(ids) - found:
+                _index.remove(med_id)
+        return _index.search(prefix, limit)
+
+
+@on_catalog_change
+def _catalog_changed(med_ids):
+    global _index, _generation
+    with _lock:
+        if med_ids is None:
+            _index = None
+            _generation += 1
+        else:
+            _dirty.update(med_ids)
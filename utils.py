@@ -1,29 +1,16 @@
-import smtplib
-from email.mime.text import MIMEText
-from email.message import EmailMessage
-from config import EMAIL_ADDRESS, EMAIL_PASSWORD, ADMIN_EMAIL
+from config import ADMIN_EMAIL
+from services.outbox import queue_email
 import random
-from datetime import datetime, timedelta
+
+# The send_* helpers only queue the message in the outbox; it goes out from a
+# background worker (through services.mail) once the caller commits, so call them
+# before db.session.commit().
 
 def send_email(to_email, subject, body):
-    try:
-        msg = MIMEText(body)
-        msg['Subject'] = subject
-        msg['From'] = EMAIL_ADDRESS
-        msg['To'] = to_email
-        with smtplib.SMTP('smtp.gmail.com', 587) as server:
-            server.starttls()
-            server.login(EMAIL_ADDRESS, EMAIL_PASSWORD)
-            server.sendmail(EMAIL_ADDRESS, [to_email], msg.as_string())
-    except Exception as e:
-        print('Email Error:', e)
+    queue_email(to_email, subject, body)
 
 def send_order_email(user_email, order_details):
-    msg = EmailMessage()
-    msg['Subject'] = '📦 New Order Placed'
-    msg['From'] = EMAIL_ADDRESS
-    msg['To'] = ADMIN_EMAIL
-    msg.set_content(f'''
+    queue_email(ADMIN_EMAIL, '📦 New Order Placed', f'''
 Hello Admin,
 
 A new order has been placed!
@@ -38,22 +25,13 @@ Thanks,
 Your Website Bot 🤖
 ''')
 
-    # Send email via Gmail SMTP
-    with smtplib.SMTP_SSL('smtp.gmail.com', 465) as smtp:
-        smtp.login(EMAIL_ADDRESS, EMAIL_PASSWORD)
-        smtp.send_message(msg)
-
 def generate_otp():
     """Generate a 6-digit OTP"""
     return str(random.randint(100000, 999999))
 
 def send_delivery_otp_email(user_email, otp):
     """Send delivery OTP to user"""
-    msg = EmailMessage()
-    msg['Subject'] = '📦 Delivery OTP - Confirm Medicine Delivery'
-    msg['From'] = EMAIL_ADDRESS
-    msg['To'] = user_email
-    msg.set_content(f'''
+    queue_email(user_email, '📦 Delivery OTP - Confirm Medicine Delivery', f'''
 Hello,
 
 Your order has been marked as delivered!
@@ -72,18 +50,9 @@ Best regards,
 Pharma Team
 ''')
 
-    # Send email via Gmail SMTP
-    with smtplib.SMTP_SSL('smtp.gmail.com', 465) as smtp:
-        smtp.login(EMAIL_ADDRESS, EMAIL_PASSWORD)
-        smtp.send_message(msg)
-
 def send_prescription_delivery_otp_email(user_email, otp):
     """Send prescription delivery OTP to user"""
-    msg = EmailMessage()
-    msg['Subject'] = '📋 Prescription Delivery OTP - Confirm Medicine Receipt'
-    msg['From'] = EMAIL_ADDRESS
-    msg['To'] = user_email
-    msg.set_content(f'''
+    queue_email(user_email, '📋 Prescription Delivery OTP - Confirm Medicine Receipt', f'''
 Hello,
 
 Your prescription medicines have been marked as delivered!
@@ -101,8 +70,3 @@ Thank you for choosing our pharmacy!
 Best regards,
 Pharma Team
 ''')
-
-    # Send email via Gmail SMTP
-    with smtplib.SMTP_SSL('smtp.gmail.com', 465) as smtp:
-        smtp.login(EMAIL_ADDRESS, EMAIL_PASSWORD)
-        smtp.send_message(msg)